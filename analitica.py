@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from compacto import agrupar_filas
+from datos import RAMAS, NIVELES_PONDERACION, columnas_asignaturas, componentes_rama, normalizar_etiqueta_rama
+
+# --- Cubo precalculado de utilidad de asignaturas por rama ---
+
+
+class CuboUtilidad:
+    """
+    Número de grados por (etiqueta de rama, asignatura, nivel de ponderación).
+
+    El cubo se obtiene con una única reducción matricial (recuento de grados
+    por etiqueta y perfil de ponderación, por one-hot de niveles de cada perfil:
+    el coste crece con los perfiles distintos) y después cualquier combinación
+    de umbral, rama y top-N se responde sumando cortes del cubo, sin volver a
+    fundir (`melt`) ni agrupar el DataFrame.
+    """
+
+    def __init__(self, df, columna_rama='Rama_de_conocimiento', asignaturas=None):
+        self.asignaturas = list(asignaturas) if asignaturas is not None else columnas_asignaturas(df)
+        self.niveles = np.array(NIVELES_PONDERACION)
+
+        codigos_etiqueta, etiquetas = pd.factorize(df[columna_rama].map(normalizar_etiqueta_rama), sort=True)
+        self.etiquetas = list(etiquetas)
+
+        pesos = df[self.asignaturas].to_numpy(dtype=float)
+        primeras, perfil = agrupar_filas(pesos)
+        niveles_one_hot = np.isclose(pesos[primeras][:, :, None], self.niveles).reshape(len(primeras), -1).astype(np.float32)
+        recuento = np.zeros((len(self.etiquetas), len(primeras)), dtype=np.float32)
+        np.add.at(recuento, (codigos_etiqueta, perfil), 1.0)
+
+        forma = (len(self.etiquetas), len(self.asignaturas), len(self.niveles))
+        self._cubo = (recuento @ niveles_one_hot).reshape(forma).astype(np.int32)
+
+        # Un mismo grado puede aparecer en varias filas (p. ej. ramas dobles desdobladas):
+        # el total global cuenta cada grado una sola vez.
+        unicos = ~df['Grado'].duplicated().to_numpy()
+        por_perfil = np.bincount(perfil[unicos], minlength=len(primeras)).astype(np.float32)
+        self._total = (por_perfil @ niveles_one_hot).reshape(forma[1:]).astype(np.int32)
+
+        # Pertenencia rama simple -> etiquetas que la contienen
+        self.ramas_simples = sorted({c for e in self.etiquetas for c in componentes_rama(e)})
+        self._pertenencia = np.array(
+            [[rama in componentes_rama(e) for e in self.etiquetas] for rama in self.ramas_simples], dtype=np.int32
+        ).reshape(len(self.ramas_simples), len(self.etiquetas))
+
+    @property
+    def ramas_compuestas(self):
+        return [e for e in self.etiquetas if '+' in e]
+
+    def nombre_rama(self, etiqueta):
+        """Nombre legible de una etiqueta ('C+SyJ' -> 'Ciencias + Ciencias Sociales y Jurídicas')."""
+        return ' + '.join(RAMAS.get(c, c) for c in componentes_rama(etiqueta))
+
+    def _corte(self, rama):
+        """Matriz asignatura x nivel con los conteos de la rama pedida."""
+        if rama is None:
+            return self._total
+        etiqueta = normalizar_etiqueta_rama(rama)
+        if etiqueta in self.ramas_simples:
+            fila = self._pertenencia[self.ramas_simples.index(etiqueta)]
+            return np.tensordot(fila, self._cubo, axes=1)
+        if etiqueta in self.etiquetas:
+            return self._cubo[self.etiquetas.index(etiqueta)]
+        return np.zeros(self._total.shape, dtype=np.int32)
+
+    def consultar(self, umbral=0.15, rama=None, top_n=10):
+        """
+        Top-N de asignaturas por número de grados con ponderación >= `umbral`.
+
+        `rama` puede ser None (todos los grados), una rama simple (cuenta todos
+        los grados que la incluyen, también los de doble rama) o una etiqueta
+        compuesta como 'AyH+SyJ' (solo los grados con exactamente esa etiqueta).
+        """
+        niveles_incluidos = self.niveles >= umbral - 1e-9
+        conteos = self._corte(rama)[:, niveles_incluidos].sum(axis=1)
+        resultado = pd.DataFrame({'Asignatura': self.asignaturas, 'Num_Grados_Utiles': conteos})
+        resultado = resultado[resultado['Num_Grados_Utiles'] > 0]
+        resultado = resultado.sort_values(['Num_Grados_Utiles', 'Asignatura'], ascending=[False, True], kind='stable')
+        return resultado.head(top_n).reset_index(drop=True)
@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+import numpy as np
+
+import busqueda
+import compacto
+import datos as modulo_datos
+import grafo
+import ingesta
+from busqueda import IndiceBusqueda
+from cache_disco import CacheDisco, huella_codigo
+from calculadora import ranking_grados
+from compacto import TABLA_PONDERACIONES
+from datos import NIVELES_PONDERACION, RAMAS_DESDOBLADAS, version_dataset
+from grafo import construir_grafo, grafo_a_json
+from ingesta import leer_ponderaciones
+
+# --- API HTTP local (JSON) sobre la misma capa de datos que la app ---
+#
+# Solo biblioteca estándar (asyncio). Cada respuesta lleva un ETag derivado de
+# la versión del dataset y de la petición (ruta + parámetros ordenados), así
+# que un cliente que repite la consulta con If-None-Match recibe un 304 sin
+# que se calcule nada. Las respuestas 200 se guardan en una caché LRU en
+# memoria indexada por ese mismo ETag. El dataset, el índice y los gráficos
+# se leen de la caché en disco (cache_disco.py) compartida con la app.
+#
+#   GET /                                   versión del dataset y rutas disponibles
+#   GET /grados?q=&rama=&limite=            búsqueda de grados (sin tildes)
+#   GET /grados/<grado>                     ramas y ponderaciones de un grado
+#   GET /asignaturas?q=&limite=             búsqueda de asignaturas
+#   GET /asignaturas/<asig>/grados?minimo=&rama=
+#                                           grados que ponderan la asignatura
+#   GET /ranking?bach=&fase=&notas=Asig:9,Asig:7&rama=&limite=
+#                                           nota de admisión en todos los grados
+#   GET /grafo?rama=&todas=0|1&perfiles=0|1&nodo=
+#                                           nodos y aristas del gráfico de una rama
+#                                           (perfiles=1: un nodo por perfil de ponderación)
+
+HOST = '127.0.0.1'
+PUERTO = 8765
+TAM_CACHE = 1024
+MAX_CABECERAS = 100
+
+_ESTADOS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class ErrorPeticion(Exception):
+    """Error que se devuelve al cliente con su código HTTP."""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+class DatosApi:
+    """
+    Dataset compacto e índice de búsqueda de una versión del CSV. Con `cache`
+    (CacheDisco) se leen de disco si ya se calcularon, en este u otro proceso
+    (las entradas son las mismas que las de la app).
+    """
+
+    def __init__(self, filepath, cache=None):
+        self.version = version_dataset(filepath)
+        self.cache = cache
+
+        def leer():
+            resultado = leer_ponderaciones(filepath, compacto=True)
+            return resultado._replace(dataset=resultado.dataset.desdoblar_ramas(RAMAS_DESDOBLADAS))
+        parametros = {'desdobles': RAMAS_DESDOBLADAS, 'codigo': huella_codigo(ingesta, compacto, modulo_datos)}
+        self.dataset = self._cacheado('dataset', parametros, leer).dataset
+        self.indice = self._cacheado('busqueda', {'codigo': huella_codigo(busqueda)},
+                                     lambda: IndiceBusqueda.desde_dataframe(self.dataset.a_dataframe()))
+
+    def _cacheado(self, espacio, parametros, calcular):
+        if self.cache is None:
+            return calcular()
+        return self.cache.obtener_o_calcular(espacio, self.version, parametros, calcular)
+
+
+# --- Parámetros ---
+
+def _numero(params, nombre, defecto, minimo, maximo, tipo=float):
+    valor = params.get(nombre)
+    if valor is None or valor == '':
+        return defecto
+    try:
+        numero = tipo(valor.replace(',', '.') if tipo is float else valor)
+    except ValueError:
+        raise ErrorPeticion(400, f"El parámetro '{nombre}' debe ser numérico.")
+    if not minimo <= numero <= maximo:
+        raise ErrorPeticion(400, f"El parámetro '{nombre}' debe estar entre {minimo} y {maximo}.")
+    return numero
+
+
+def _notas(texto, dataset):
+    """'Matemáticas_II:9,Física:7.5' -> {'Matemáticas_II': 9.0, 'Física': 7.5}."""
+    notas = {}
+    for par in filter(None, (p.strip() for p in (texto or '').split(','))):
+        asig, separador, nota = par.rpartition(':')
+        if not separador or dataset.columna(asig) is None:
+            raise ErrorPeticion(400, f"Nota de asignatura no válida: {par!r} (formato Asignatura:nota).")
+        notas[asig] = _numero({'nota': nota}, 'nota', 0.0, 0.0, 10.0)
+    return notas
+
+
+def _rama(params, datos):
+    rama = params.get('rama') or None
+    if rama is not None and rama not in datos.dataset.ramas_unicas():
+        raise ErrorPeticion(404, f"Rama desconocida: {rama!r}.")
+    return rama
+
+
+# --- Recursos ---
+
+def _indice(datos, params):
+    return {'version': datos.version, 'rutas': ['/grados', '/grados/<grado>', '/asignaturas',
+                                               '/asignaturas/<asignatura>/grados', '/ranking', '/grafo']}
+
+
+def _buscar(tipo):
+    def recurso(datos, params):
+        limite = _numero(params, 'limite', 20, 1, 1000, int)
+        rama = _rama(params, datos)
+        consulta = params.get('q', '')
+        if consulta:
+            encontrados = datos.indice.buscar(consulta, tipo=tipo, rama=rama, limite=limite)
+        else:
+            encontrados = datos.indice.listar(tipo=tipo, rama=rama, limite=limite)
+        return [{'valor': valor, 'etiqueta': etiqueta} for valor, etiqueta in encontrados]
+    return recurso
+
+
+def _grado(datos, params, grado):
+    registro = datos.dataset.registro(grado)
+    if registro is None:
+        raise ErrorPeticion(404, f"Grado desconocido: {grado!r}.")
+    ramas = datos.dataset.ramas[datos.dataset.filas_de_grado(grado)]
+    return {'grado': grado, 'ramas': list(dict.fromkeys(ramas)), 'ponderaciones': registro.ponderaciones()}
+
+
+def _grados_de_asignatura(datos, params, asignatura):
+    dataset = datos.dataset
+    j = dataset.columna(asignatura)
+    if j is None:
+        raise ErrorPeticion(404, f"Asignatura desconocida: {asignatura!r}.")
+    minimo = _numero(params, 'minimo', NIVELES_PONDERACION[0], 0.0, 1.0)
+    rama = _rama(params, datos)
+    filas = dataset.filas_de_rama(rama) if rama else np.arange(len(dataset))
+    # El filtro se evalúa una vez por perfil de ponderación y se reparte a sus filas
+    perfiles = dataset.perfiles()
+    pesos_perfil = TABLA_PONDERACIONES[perfiles.codigos[:, j]]
+    seleccion_perfil = (pesos_perfil > 0) & (pesos_perfil >= minimo - 1e-9)
+    perfil_de_fila = perfiles.de_fila[filas]
+    seleccion = seleccion_perfil[perfil_de_fila]
+    filas, pesos = filas[seleccion], pesos_perfil[perfil_de_fila[seleccion]]
+    orden = np.lexsort((np.asarray(dataset.grados[filas], dtype=object), -pesos))
+    return [{'grado': dataset.grados[filas[i]], 'rama': dataset.ramas[filas[i]], 'ponderacion': float(pesos[i])} for i in orden]
+
+
+def _ranking(datos, params):
+    bach = _numero(params, 'bach', None, 0.0, 10.0)
+    fase = _numero(params, 'fase', None, 0.0, 10.0)
+    if bach is None or fase is None:
+        raise ErrorPeticion(400, "Faltan los parámetros 'bach' y 'fase'.")
+    rama = _rama(params, datos)
+    limite = _numero(params, 'limite', 50, 1, 10000, int)
+    ranking = ranking_grados(datos.dataset, bach, fase, _notas(params.get('notas'), datos.dataset))
+    if rama is not None:
+        ranking = ranking[ranking['Grado'].isin(datos.dataset.grados[datos.dataset.filas_de_rama(rama)])]
+    return ranking.head(limite).round(3).to_dict(orient='records')
+
+
+def _grafo(datos, params):
+    rama = _rama(params, datos)
+    if rama is None:
+        raise ErrorPeticion(400, "Falta el parámetro 'rama'.")
+    todas = params.get('todas', '0').lower() in ('1', 'true', 'si', 'sí')
+    perfiles = params.get('perfiles', '0').lower() in ('1', 'true', 'si', 'sí')
+    nodo = params.get('nodo') or None
+
+    def construir():
+        df_rama = datos.dataset.a_dataframe(filas=datos.dataset.filas_de_rama(rama))
+        return grafo_a_json(construir_grafo(df_rama, mostrar_ponderacion_01=todas, selected_node_id=nodo, agrupar_perfiles=perfiles))
+    parametros = {'rama': rama, 'todas': todas, 'perfiles': perfiles, 'nodo': nodo, 'codigo': huella_codigo(grafo)}
+    return datos._cacheado('grafo_json', parametros, construir)
+
+
+def resolver(datos, segmentos, params):
+    """Despacha una ruta ya dividida en segmentos (decodificados) al recurso correspondiente."""
+    if not segmentos:
+        return _indice(datos, params)
+    if segmentos == ['grados']:
+        return _buscar('grado')(datos, params)
+    if len(segmentos) == 2 and segmentos[0] == 'grados':
+        return _grado(datos, params, segmentos[1])
+    if segmentos == ['asignaturas']:
+        return _buscar('asignatura')(datos, params)
+    if len(segmentos) == 3 and segmentos[0] == 'asignaturas' and segmentos[2] == 'grados':
+        return _grados_de_asignatura(datos, params, segmentos[1])
+    if segmentos == ['ranking']:
+        return _ranking(datos, params)
+    if segmentos == ['grafo']:
+        return _grafo(datos, params)
+    raise ErrorPeticion(404, "Ruta no encontrada.")
+
+
+# --- Servidor ---
+
+class ServicioPonderaciones:
+    """
+    Servidor HTTP/1.1 mínimo (GET/HEAD, keep-alive) con caché de respuestas.
+    Si cambia el CSV, el dataset se recarga en segundo plano y la caché se vacía:
+    los ETag nuevos ya no coinciden con los antiguos.
+    """
+
+    def __init__(self, filepath, tam_cache=TAM_CACHE):
+        self.filepath = filepath
+        self.tam_cache = tam_cache
+        self.cache_disco = CacheDisco()
+        self._datos = DatosApi(filepath, self.cache_disco)
+        self._cache = OrderedDict()  # etag -> cuerpo JSON
+        self._recarga = asyncio.Lock()
+
+    async def _datos_actuales(self):
+        if version_dataset(self.filepath) != self._datos.version:
+            async with self._recarga:
+                if version_dataset(self.filepath) != self._datos.version:
+                    self._datos = await asyncio.get_running_loop().run_in_executor(None, DatosApi, self.filepath, self.cache_disco)
+                    self._cache.clear()
+        return self._datos
+
+    async def procesar(self, metodo, objetivo, cabeceras):
+        """Devuelve (estado, cabeceras extra, cuerpo)."""
+        if metodo not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, _json({'error': "Solo se admiten GET y HEAD."})
+        partes = urlsplit(objetivo)
+        segmentos = [unquote(s) for s in partes.path.split('/') if s]
+        params = sorted(parse_qsl(partes.query, keep_blank_values=True))
+        datos = await self._datos_actuales()
+
+        huella = hashlib.sha256(f"{datos.version}\n{'/'.join(segmentos)}\n{urlencode(params)}".encode('utf-8'))
+        etag = f'"{datos.version}-{huella.hexdigest()[:16]}"'
+        # Solo una coincidencia con el ETag calculado (fuerte o débil, W/"...") evita la respuesta;
+        # '*' no, porque aún no se sabe si la ruta existe o la petición es válida.
+        if_none_match = {e.strip().removeprefix('W/') for e in cabeceras.get('if-none-match', '').split(',')}
+        if etag in if_none_match:
+            return 304, {'ETag': etag}, b''
+
+        cuerpo = self._cache.get(etag)
+        if cuerpo is not None:
+            self._cache.move_to_end(etag)
+            return 200, {'ETag': etag}, cuerpo
+        try:
+            contenido = await asyncio.get_running_loop().run_in_executor(None, resolver, datos, segmentos, dict(params))
+        except ErrorPeticion as e:
+            return e.estado, {}, _json({'error': e.mensaje})
+        cuerpo = _json(contenido)
+        self._cache[etag] = cuerpo
+        if len(self._cache) > self.tam_cache:
+            self._cache.popitem(last=False)
+        return 200, {'ETag': etag}, cuerpo
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, objetivo, protocolo = linea.decode('latin1').split()
+                except ValueError:
+                    await _responder(writer, 400, {}, _json({'error': "Petición mal formada."}), False, True)
+                    break
+                cabeceras = {}
+                for _ in range(MAX_CABECERAS):
+                    cabecera = await reader.readline()
+                    if cabecera in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = cabecera.decode('latin1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                if cabeceras.get('content-length', '0').isdigit() and int(cabeceras.get('content-length', '0')):
+                    await reader.readexactly(int(cabeceras['content-length']))
+
+                conexion = cabeceras.get('connection', '').lower()
+                mantener = conexion == 'keep-alive' if protocolo == 'HTTP/1.0' else conexion != 'close'
+                try:
+                    estado, extra, cuerpo = await self.procesar(metodo, objetivo, cabeceras)
+                except Exception as e:  # el servidor no debe caer por una petición
+                    estado, extra, cuerpo = 500, {}, _json({'error': f"Error interno: {e}"})
+                await _responder(writer, estado, extra, cuerpo, metodo == 'HEAD', not mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _json(contenido):
+    return json.dumps(contenido, ensure_ascii=False).encode('utf-8')
+
+
+async def _responder(writer, estado, extra, cuerpo, solo_cabeceras, cerrar):
+    cabeceras = {'Content-Type': 'application/json; charset=utf-8', 'Cache-Control': 'no-cache',
+                 'Content-Length': str(len(cuerpo)), 'Connection': 'close' if cerrar else 'keep-alive', **extra}
+    if estado == 304:
+        del cabeceras['Content-Length'], cabeceras['Content-Type']
+    cabecera = f"HTTP/1.1 {estado} {_ESTADOS.get(estado, '')}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in cabeceras.items())
+    writer.write(cabecera.encode('latin1') + b'\r\n' + (b'' if solo_cabeceras or estado == 304 else cuerpo))
+    await writer.drain()
+
+
+async def servir(filepath, host=HOST, puerto=PUERTO):
+    servicio = ServicioPonderaciones(filepath)
+    servidor = await asyncio.start_server(servicio.atender, host, puerto)
+    print(f"API de ponderaciones (datos {servicio._datos.version}) en http://{host}:{puerto}/")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+# --- SCRIPT PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP local (JSON) de ponderaciones.")
+    parser.add_argument('--csv', default='ponderaciones_andalucia.csv')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    args = parser.parse_args()
+    try:
+        asyncio.run(servir(args.csv, args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
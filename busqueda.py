@@ -0,0 +1,144 @@
+import bisect
+import math
+import unicodedata
+
+import numpy as np
+
+from datos import RAMAS, columnas_asignaturas, componentes_rama
+
+# --- Índice de búsqueda sin tildes para grados, asignaturas y ramas ---
+
+MAX_TRIGRAMAS_CONSULTA = 10
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y con '_' / '.' como espacios: 'Biología_y_Geología' -> 'biologia y geologia'."""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = texto.casefold().replace('_', ' ').replace('.', ' ')
+    return ' '.join(texto.split())
+
+
+def trigramas(texto_normalizado):
+    relleno = f"  {texto_normalizado} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceBusqueda:
+    """
+    Búsqueda difusa e insensible a tildes/mayúsculas.
+
+    Cada entrada tiene un tipo ('grado', 'asignatura' o 'rama'), el valor que
+    usa la aplicación, el texto que se muestra y, opcionalmente, las ramas a las
+    que pertenece. Se indexa una vez por versión del dataset con un índice
+    invertido de trigramas (para errores y coincidencias parciales) y una lista
+    ordenada de palabras (para prefijos de una o dos letras).
+    """
+
+    def __init__(self, entradas):
+        self.tipos, self.valores, self.etiquetas, self.ramas = [], [], [], []
+        for tipo, valor, etiqueta, ramas in entradas:
+            self.tipos.append(tipo)
+            self.valores.append(valor)
+            self.etiquetas.append(etiqueta)
+            self.ramas.append(frozenset(ramas))
+        self._normalizados = [normalizar_texto(e) for e in self.etiquetas]
+        self._longitudes = np.array([len(t) for t in self._normalizados], dtype=np.int32)
+        self._etiqueta_de = {(t, v): e for t, v, e in zip(self.tipos, self.valores, self.etiquetas)}
+        self._orden_alfabetico = np.argsort(np.array(self._normalizados, dtype=object), kind='stable')
+        self._mascaras_tipo = {t: np.array([x == t for x in self.tipos]) for t in set(self.tipos)}
+        self._mascaras_rama = {}
+        for i, ramas in enumerate(self.ramas):
+            for rama in ramas:
+                self._mascaras_rama.setdefault(rama, np.zeros(len(self.valores), dtype=bool))[i] = True
+
+        postings = {}
+        palabras = []
+        for i, texto in enumerate(self._normalizados):
+            for gram in trigramas(texto):
+                postings.setdefault(gram, []).append(i)
+            palabras.extend((palabra, i) for palabra in set(texto.split()))
+        self._postings = {gram: np.array(ids, dtype=np.intp) for gram, ids in postings.items()}
+        palabras.sort()
+        self._palabras = [p for p, _ in palabras]
+        self._ids_palabras = np.array([i for _, i in palabras], dtype=np.int32)
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """Índice con los grados, las asignaturas de 2º Bach y las ramas de un DataFrame limpio."""
+        entradas = []
+        for grado, ramas in df.groupby('Grado', sort=False)['Rama_de_conocimiento']:
+            entradas.append(('grado', grado, grado, set(ramas)))
+        for asig in columnas_asignaturas(df):
+            ramas = set(df.loc[df[asig] > 0, 'Rama_de_conocimiento'])
+            entradas.append(('asignatura', asig, asig.replace('_', ' ').replace('.', ' '), ramas))
+        for rama in sorted(df['Rama_de_conocimiento'].unique()):
+            nombre = ' + '.join(RAMAS.get(c, c) for c in componentes_rama(rama))
+            etiqueta = rama if nombre == rama else f"{nombre} ({rama})"
+            entradas.append(('rama', rama, etiqueta, {rama}))
+        return cls(entradas)
+
+    def etiqueta(self, tipo, valor):
+        """Texto mostrado para un valor ('Matemáticas_II' -> 'Matemáticas II')."""
+        return self._etiqueta_de.get((tipo, valor), str(valor))
+
+    def _mascara(self, tipo, rama):
+        mascara = np.ones(len(self.valores), dtype=bool)
+        if tipo is not None:
+            mascara &= self._mascaras_tipo.get(tipo, False)
+        if rama is not None:
+            mascara &= self._mascaras_rama.get(rama, False)
+        return mascara
+
+    def listar(self, tipo=None, rama=None, limite=20):
+        """Primeras entradas en orden alfabético, para cuando todavía no se ha escrito nada."""
+        orden = self._orden_alfabetico
+        ids = orden[self._mascara(tipo, rama)[orden]][:limite]
+        return [(self.valores[i], self.etiquetas[i]) for i in ids]
+
+    def _candidatas(self, consulta, minimo):
+        """Entradas candidatas y su puntuación (fracción de trigramas de la consulta presentes)."""
+        n = len(self.valores)
+        if len(consulta) < 3:
+            # Consultas muy cortas: prefijo de palabra mediante búsqueda binaria
+            inicio = bisect.bisect_left(self._palabras, consulta)
+            fin = bisect.bisect_left(self._palabras, consulta + '\uffff')
+            marcadas = np.zeros(n, dtype=bool)
+            marcadas[self._ids_palabras[inicio:fin]] = True
+            ids = np.flatnonzero(marcadas)
+            return ids, np.ones(len(ids))
+        # En consultas largas bastan los trigramas más selectivos (los de listas más cortas)
+        grams = sorted(trigramas(consulta), key=lambda g: len(self._postings.get(g, ())))[:MAX_TRIGRAMAS_CONSULTA]
+        listas = [self._postings[g] for g in grams if g in self._postings]
+        if not listas:
+            return np.array([], dtype=np.intp), np.array([])
+        conteos = np.bincount(np.concatenate(listas), minlength=n)
+        ids = np.flatnonzero(conteos >= math.ceil(minimo * len(grams)))
+        return ids, conteos[ids] / len(grams)
+
+    def buscar(self, consulta, tipo=None, rama=None, limite=20, minimo=0.5):
+        """
+        Lista de (valor, etiqueta) ordenada por relevancia.
+
+        Primero puntúa por trigramas en bloque y solo las mejores candidatas
+        reciben el desempate por prefijo/subcadena y longitud.
+        """
+        consulta = normalizar_texto(consulta)
+        if not consulta:
+            return []
+        ids, puntuacion = self._candidatas(consulta, minimo)
+        if tipo is not None or rama is not None:
+            validas = self._mascara(tipo, rama)[ids]
+            ids, puntuacion = ids[validas], puntuacion[validas]
+        if len(ids) > limite * 4:
+            mejores = np.argpartition(-puntuacion, limite * 4)[:limite * 4]
+            ids, puntuacion = ids[mejores], puntuacion[mejores]
+        puntuacion_de = dict(zip(ids.tolist(), puntuacion.tolist()))
+
+        def clave(i):
+            texto = self._normalizados[i]
+            bonus = 2.0 if texto.startswith(consulta) else 1.0 if f" {consulta}" in f" {texto}" else 0.0
+            return (-(puntuacion_de[i] + bonus), self._longitudes[i], texto)
+
+        ordenadas = sorted(puntuacion_de, key=clave)[:limite]
+        return [(self.valores[i], self.etiquetas[i]) for i in ordenadas]
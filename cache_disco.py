@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos al recortar
+    fcntl = None
+
+# --- Caché persistente en disco ---
+#
+# Guarda resultados costosos (dataset compacto, índices, HTML de gráficos,
+# imágenes) para que un reinicio o un despliegue no obligue a recalcularlos.
+# Cada entrada es un pickle en <directorio>/<espacio>/<ab>/<clave>.pkl, con la
+# clave derivada de la versión del dataset (hash de su contenido), de los
+# parámetros y de la huella del código que la produce, así que un CSV o un
+# código distintos nunca leen entradas antiguas.
+#
+# - Escritura atómica: archivo temporal en el mismo directorio + os.replace; un
+#   lector (de este u otro proceso) ve la entrada entera o no la ve.
+# - LRU por tamaño: leer una entrada actualiza su fecha de modificación y, al
+#   superar el tamaño máximo, se borran las menos usadas hasta dejarla al 80%.
+#   El recorte se hace con un cerrojo de archivo para que solo lo haga un proceso.
+# - Una entrada que desaparece (recortada por otro proceso) o que no se puede
+#   leer cuenta como fallo y se recalcula.
+
+DIRECTORIO_CACHE = os.environ.get('PONDERACIONES_CACHE_DIR', '.cache_ponderaciones')
+TAM_MAXIMO_MB = float(os.environ.get('PONDERACIONES_CACHE_MB', 256))
+FRACCION_TRAS_RECORTE = 0.8
+# Temporales de escrituras interrumpidas (proceso muerto) que se borran al recortar
+SEGUNDOS_TEMPORAL_HUERFANO = 3600
+EXTENSION = '.pkl'
+# Cambiar si cambia el formato de las entradas
+FORMATO = 1
+_FALTA = object()
+
+_huellas = {}
+
+
+def huella_codigo(*modulos):
+    """Hash del código fuente de los módulos dados (memorizado por proceso)."""
+    clave = tuple(m.__name__ for m in modulos)
+    if clave not in _huellas:
+        h = hashlib.sha256()
+        for modulo in modulos:
+            with open(modulo.__file__, 'rb') as f:
+                h.update(f.read())
+        _huellas[clave] = h.hexdigest()[:16]
+    return _huellas[clave]
+
+
+class CacheDisco:
+    """Caché clave -> objeto en disco, compartida entre procesos y reinicios."""
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, tam_maximo_mb=TAM_MAXIMO_MB):
+        self.directorio = directorio
+        self.tam_maximo = int(tam_maximo_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._tam_estimado = None
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def clave(version, parametros):
+        texto = json.dumps([FORMATO, version, parametros], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _ruta(self, espacio, clave):
+        return os.path.join(self.directorio, espacio, clave[:2], clave + EXTENSION)
+
+    def obtener(self, espacio, version, parametros=None, defecto=None):
+        """Valor guardado para (espacio, versión, parámetros) o `defecto` si no está."""
+        ruta = self._ruta(espacio, self.clave(version, parametros))
+        try:
+            with open(ruta, 'rb') as f:
+                entrada = pickle.load(f)
+        except FileNotFoundError:
+            self.fallos += 1
+            return defecto
+        except Exception:
+            # Entrada corrupta o de un código incompatible: se descarta
+            self._borrar(ruta)
+            self.fallos += 1
+            return defecto
+        try:
+            os.utime(ruta)  # uso reciente para el LRU
+        except FileNotFoundError:
+            pass
+        self.aciertos += 1
+        return entrada['valor']
+
+    def guardar(self, espacio, version, parametros, valor):
+        """Guarda el valor de forma atómica y recorta la caché si supera el tamaño máximo."""
+        ruta = self._ruta(espacio, self.clave(version, parametros))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        entrada = {'version': version, 'parametros': parametros, 'guardado': time.time(), 'valor': valor}
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                pickle.dump(entrada, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, ruta)
+        except BaseException:
+            self._borrar(temporal)
+            raise
+        with self._lock:
+            if self._tam_estimado is None:
+                self._tam_estimado = sum(tam for _, _, tam in self._entradas())
+            else:
+                self._tam_estimado += os.path.getsize(ruta)
+            recortar = self._tam_estimado > self.tam_maximo
+        if recortar:
+            self.recortar()
+        return valor
+
+    def obtener_o_calcular(self, espacio, version, parametros, calcular):
+        """Valor guardado o, si no está, `calcular()` guardado para la próxima vez."""
+        valor = self.obtener(espacio, version, parametros, defecto=_FALTA)
+        if valor is _FALTA:
+            valor = self.guardar(espacio, version, parametros, calcular())
+        return valor
+
+    # --- Mantenimiento ---
+
+    def _entradas(self, espacio=None, extension=EXTENSION):
+        """(ruta, fecha de último uso, tamaño) de cada entrada, opcionalmente de un espacio."""
+        base = os.path.join(self.directorio, espacio) if espacio else self.directorio
+        for raiz, _, archivos in os.walk(base):
+            for nombre in archivos:
+                if nombre.endswith(extension):
+                    ruta = os.path.join(raiz, nombre)
+                    try:
+                        stat = os.stat(ruta)
+                    except FileNotFoundError:
+                        continue
+                    yield ruta, stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
+
+    def recortar(self):
+        """Borra las entradas menos usadas hasta dejar la caché al 80% del tamaño máximo."""
+        os.makedirs(self.directorio, exist_ok=True)
+        with open(os.path.join(self.directorio, '.cerrojo'), 'w') as cerrojo:
+            if fcntl is not None:
+                fcntl.flock(cerrojo, fcntl.LOCK_EX)
+            entradas = sorted(self._entradas(), key=lambda e: e[1])
+            total = sum(tam for _, _, tam in entradas)
+            objetivo = self.tam_maximo * FRACCION_TRAS_RECORTE
+            for ruta, _, tam in entradas:
+                if total <= objetivo:
+                    break
+                self._borrar(ruta)
+                total -= tam
+            limite_temporales = time.time() - SEGUNDOS_TEMPORAL_HUERFANO
+            for ruta, modificado, _ in list(self._entradas(extension='.tmp')):
+                if modificado < limite_temporales:
+                    self._borrar(ruta)
+        with self._lock:
+            self._tam_estimado = total
+
+    def recientes(self, espacio, version, n):
+        """Parámetros de las `n` entradas de una versión usadas más recientemente (para precargarlas)."""
+        parametros = []
+        for ruta, _, _ in sorted(self._entradas(espacio), key=lambda e: e[1], reverse=True):
+            if len(parametros) >= n:
+                break
+            try:
+                with open(ruta, 'rb') as f:
+                    entrada = pickle.load(f)
+            except Exception:
+                continue
+            if entrada.get('version') == version:
+                parametros.append(entrada['parametros'])
+        return parametros
+
+    def estado(self):
+        entradas = list(self._entradas())
+        return {
+            'directorio': self.directorio,
+            'entradas': len(entradas),
+            'bytes': sum(tam for _, _, tam in entradas),
+            'tam_maximo': self.tam_maximo,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+        }
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+# --- Nota de admisión: 60% Bachillerato + 40% Fase General + las dos mejores específicas ---
+
+PESO_BACHILLERATO = 0.6
+PESO_FASE_GENERAL = 0.4
+NOTA_MINIMA_ESPECIFICA = 5.0
+NOTA_MAXIMA = 10.0
+MAX_ESPECIFICAS = 2
+DECIMALES_NOTA = 3
+
+
+def nota_base(nota_bachillerato, nota_fase_general):
+    """Nota de acceso sobre 10."""
+    return PESO_BACHILLERATO * nota_bachillerato + PESO_FASE_GENERAL * nota_fase_general
+
+
+def mejores_especificas(ponderaciones, notas):
+    """
+    Aportaciones de las asignaturas específicas para un grado: solo cuentan las
+    que tienen nota >= 5 y ponderan (> 0), y se eligen las dos que más aportan.
+    `ponderaciones` y `notas` son diccionarios asignatura -> valor.
+    Devuelve una lista de dicts (name, grade, ponderacion, contribution) de mayor a menor.
+    """
+    contribuciones = []
+    for asig, nota in notas.items():
+        ponderacion = ponderaciones.get(asig, 0)
+        if nota >= NOTA_MINIMA_ESPECIFICA and ponderacion > 0:
+            contribuciones.append({"name": asig, "grade": nota, "ponderacion": ponderacion, "contribution": ponderacion * nota})
+    return sorted(contribuciones, key=lambda x: x["contribution"], reverse=True)[:MAX_ESPECIFICAS]
+
+
+def _filas_grados(dataset):
+    """Primera fila de cada grado (un grado en varias ramas sale una sola vez), en el orden del dataset."""
+    _, primeras = np.unique(dataset.grados.codes, return_index=True)
+    return np.sort(primeras)
+
+
+def _mejores_aportes(dataset, filas, notas):
+    """
+    Matriz grados x MAX_ESPECIFICAS con las mejores aportaciones (ponderación *
+    nota, solo notas >= 5) de cada grado, de mayor a menor y con ceros si faltan.
+    Solo depende de las ponderaciones, así que se calcula una vez por perfil de
+    ponderación y se reparte a los grados de cada perfil.
+    """
+    validas = {a: n for a, n in notas.items() if n >= NOTA_MINIMA_ESPECIFICA and dataset.columna(a) is not None}
+    perfiles = dataset.perfiles()
+    ids, perfil_de_fila = perfiles.de_filas(filas)
+    aportes = np.zeros((len(ids), MAX_ESPECIFICAS))
+    if validas:
+        aportes = np.hstack([aportes, perfiles.pesos(ids, list(validas)) * np.fromiter(validas.values(), dtype=np.float64)])
+    aportes.sort(axis=1)
+    return aportes[:, ::-1][:, :MAX_ESPECIFICAS][perfil_de_fila]
+
+
+def _redondear_arriba(notas, decimales=DECIMALES_NOTA):
+    """Redondea hacia arriba (sin que el ruido de coma flotante sume una milésima) para garantizar el objetivo."""
+    escala = 10 ** decimales
+    return np.ceil(np.round(notas * escala, 6)) / escala
+
+
+def _tabla_grados(dataset, filas, columnas):
+    return pd.DataFrame({
+        'Grado': np.asarray(dataset.grados[filas], dtype=object),
+        'Rama_de_conocimiento': np.asarray(dataset.ramas[filas], dtype=object),
+        **columnas,
+    })
+
+
+def ranking_grados(dataset, nota_bachillerato, nota_fase_general, notas):
+    """
+    Nota de admisión del alumno en todos los grados a la vez.
+
+    Las ponderaciones solo se decodifican para las asignaturas con nota >= 5 y
+    las dos mejores aportaciones de cada grado se obtienen ordenando la matriz
+    grados x asignaturas por filas. Un grado que aparece en varias ramas sale
+    una sola vez (con su primera rama). Devuelve un DataFrame ordenado de mayor
+    a menor nota con Grado, Rama_de_conocimiento, Nota_Base, Nota_Especifica
+    y Nota_Admision.
+    """
+    filas = _filas_grados(dataset)
+    base = nota_base(nota_bachillerato, nota_fase_general)
+    especifica = _mejores_aportes(dataset, filas, notas).sum(axis=1)
+    ranking = _tabla_grados(dataset, filas, {
+        'Nota_Base': base,
+        'Nota_Especifica': especifica,
+        'Nota_Admision': base + especifica,
+    })
+    return ranking.sort_values(['Nota_Admision', 'Grado'], ascending=[False, True], ignore_index=True)
+
+
+# --- Cálculo inverso: nota mínima necesaria para llegar a una nota objetivo ---
+
+def _ordenar_por_necesaria(tabla):
+    """Alcanzables primero (de menor a mayor nota necesaria) y los inalcanzables (NaN) al final."""
+    return tabla.sort_values(['Nota_Necesaria', 'Grado'], na_position='last', ignore_index=True)
+
+
+def nota_necesaria_asignatura(dataset, asignatura, objetivo, nota_bachillerato, nota_fase_general, notas):
+    """
+    Nota mínima en `asignatura` para alcanzar `objetivo` en cada grado, con las
+    notas de Bachillerato, Fase General y demás específicas (`notas`) fijas.
+
+    Sin la asignatura, el grado tiene base + a1 + a2 (sus dos mejores aportaciones).
+    Con nota g >= 5 la asignatura aporta p * g y la suma de las dos mejores pasa a
+    ser a1 + max(a2, p * g), así que si hace falta subir, g = (objetivo - base - a1) / p,
+    y como mínimo 5 para que cuente. Se calcula para todos los grados a la vez.
+
+    Devuelve un DataFrame con Grado, Rama_de_conocimiento, Ponderacion,
+    Nota_Sin_Asignatura y Nota_Necesaria: 0 si el objetivo ya se alcanza sin
+    ella, NaN si no se alcanza ni con un 10 (o la asignatura no pondera), y si no
+    la nota redondeada hacia arriba a milésimas. Lanza ValueError si la
+    asignatura no existe en el dataset.
+    """
+    if dataset.columna(asignatura) is None:
+        raise ValueError(f"La asignatura '{asignatura}' no está en el dataset.")
+    filas = _filas_grados(dataset)
+    base = nota_base(nota_bachillerato, nota_fase_general)
+    mejores = _mejores_aportes(dataset, filas, {a: n for a, n in notas.items() if a != asignatura})
+    sin_asignatura = base + mejores.sum(axis=1)
+    ponderacion = dataset.pesos(filas, [asignatura])[:, 0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        necesaria = _redondear_arriba(np.maximum((objetivo - base - mejores[:, 0]) / ponderacion, NOTA_MINIMA_ESPECIFICA))
+    necesaria[(ponderacion == 0) | (necesaria > NOTA_MAXIMA)] = np.nan
+    necesaria[sin_asignatura >= objetivo] = 0.0
+
+    return _ordenar_por_necesaria(_tabla_grados(dataset, filas, {
+        'Ponderacion': ponderacion,
+        'Nota_Sin_Asignatura': sin_asignatura,
+        'Nota_Necesaria': necesaria,
+    }))
+
+
+def nota_necesaria_fase_general(dataset, objetivo, nota_bachillerato, notas):
+    """
+    Nota mínima de la Fase General para alcanzar `objetivo` en cada grado, con
+    Bachillerato y específicas fijas: (objetivo - 0.6 * bach - específica) / 0.4.
+    Devuelve un DataFrame con Grado, Rama_de_conocimiento, Nota_Especifica y
+    Nota_Necesaria (0 si basta cualquier nota, NaN si no llega ni con un 10).
+    """
+    filas = _filas_grados(dataset)
+    especifica = _mejores_aportes(dataset, filas, notas).sum(axis=1)
+    necesaria = _redondear_arriba(np.maximum((objetivo - PESO_BACHILLERATO * nota_bachillerato - especifica) / PESO_FASE_GENERAL, 0.0))
+    necesaria[necesaria > NOTA_MAXIMA] = np.nan
+
+    return _ordenar_por_necesaria(_tabla_grados(dataset, filas, {
+        'Nota_Especifica': especifica,
+        'Nota_Necesaria': necesaria,
+    }))
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from datos import COLUMNAS_ID, NIVELES_PONDERACION, columnas_asignaturas
+
+# --- Representación compacta del dataset de ponderaciones ---
+
+# Código uint8 -> ponderación. El orden es creciente, así que ordenar por código
+# equivale a ordenar por ponderación.
+TABLA_PONDERACIONES = np.array((0.0,) + NIVELES_PONDERACION)
+
+
+def codificar_ponderaciones(pesos):
+    """Matriz de ponderaciones (0, 0.1, 0.15, 0.2) -> matriz uint8 de códigos de TABLA_PONDERACIONES."""
+    pesos = np.asarray(pesos, dtype=np.float64)
+    codigos = np.zeros(pesos.shape, dtype=np.uint8)
+    for codigo, valor in enumerate(TABLA_PONDERACIONES[1:], start=1):
+        codigos[np.isclose(pesos, valor)] = codigo
+    return codigos
+
+
+def agrupar_filas(matriz):
+    """
+    Agrupa las filas idénticas de una matriz 2D por hash de sus bytes (una
+    pasada, sin ordenar). Devuelve (primeras, clase_de_fila): la primera fila de
+    cada clase, en orden de aparición, y la clase (0..n_clases-1) de cada fila.
+    """
+    matriz = np.ascontiguousarray(matriz)
+    if matriz.shape[1] == 0:
+        clases = np.zeros(len(matriz), dtype=np.intp)
+    else:
+        clases, _ = pd.factorize(matriz.view(np.dtype((np.void, matriz.itemsize * matriz.shape[1]))).ravel())
+    primeras = np.full(clases.max() + 1 if len(clases) else 0, len(clases), dtype=np.intp)
+    np.minimum.at(primeras, clases, np.arange(len(clases)))
+    return primeras, clases
+
+
+class PerfilesPonderacion:
+    """
+    Clases de equivalencia de las filas del dataset con el mismo vector de
+    ponderaciones (p. ej. casi todas las ingenierías de IyA o los dobles grados
+    con Ciencias Ambientales). Lo que solo depende de las ponderaciones se
+    calcula una vez por perfil y se reparte a las filas con `de_fila`.
+    """
+
+    def __init__(self, dataset):
+        self._dataset = dataset
+        self.primeras, self.de_fila = agrupar_filas(dataset.codigos)
+        self.codigos = dataset.codigos[self.primeras]
+
+    def __len__(self):
+        return len(self.primeras)
+
+    def de_filas(self, filas):
+        """(perfiles distintos de `filas`, posición de cada fila en ellos), para calcular por perfil y repartir."""
+        return np.unique(self.de_fila[filas], return_inverse=True)
+
+    def pesos(self, perfiles=None, columnas=None):
+        """Ponderaciones decodificadas de los perfiles y asignaturas pedidos (como DatasetCompacto.pesos)."""
+        codigos = self.codigos if perfiles is None else self.codigos[perfiles]
+        if columnas is not None:
+            codigos = codigos[:, [self._dataset.columna(c) for c in columnas]]
+        return TABLA_PONDERACIONES[codigos]
+
+
+class RegistroGrado:
+    """Vista ligera de una fila del dataset; las ponderaciones se decodifican al pedirlas."""
+
+    __slots__ = ('indice', 'grado', 'rama', '_dataset')
+
+    def __init__(self, dataset, indice):
+        self._dataset = dataset
+        self.indice = indice
+        self.grado = dataset.grados[indice]
+        self.rama = dataset.ramas[indice]
+
+    def ponderacion(self, asignatura, default=0.0):
+        j = self._dataset.columna(asignatura)
+        if j is None:
+            return default
+        return float(TABLA_PONDERACIONES[self._dataset.codigos[self.indice, j]])
+
+    def ponderaciones(self):
+        """Diccionario asignatura -> ponderación, solo con las asignaturas que ponderan (> 0)."""
+        fila = self._dataset.codigos[self.indice]
+        return {self._dataset.asignaturas[j]: float(TABLA_PONDERACIONES[fila[j]]) for j in np.flatnonzero(fila)}
+
+    def __repr__(self):
+        return f"RegistroGrado({self.grado!r}, {self.rama!r})"
+
+
+class DatasetCompacto:
+    """
+    Dataset de ponderaciones en memoria compacta.
+
+    Cada celda de ponderación ocupa un byte (código uint8 sobre
+    TABLA_PONDERACIONES) y los nombres de grado y rama se guardan como
+    categorías (cada texto distinto una sola vez y un código entero por fila).
+    Los DataFrame con ponderaciones en coma flotante solo se materializan
+    para las filas y columnas que se van a mostrar o puntuar.
+    """
+
+    def __init__(self, grados, ramas, asignaturas, codigos):
+        self.grados = pd.Categorical(grados)
+        self.ramas = pd.Categorical(ramas)
+        self.asignaturas = list(asignaturas)
+        self.codigos = np.ascontiguousarray(codigos, dtype=np.uint8)
+        self._columna = {asig: j for j, asig in enumerate(self.asignaturas)}
+        self._filas_por_grado = None
+        self._perfiles = None
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        asignaturas = columnas_asignaturas(df)
+        return cls(df['Grado'], df['Rama_de_conocimiento'], asignaturas, codificar_ponderaciones(df[asignaturas].to_numpy()))
+
+    @classmethod
+    def desde_bloques(cls, bloques, asignaturas):
+        """Une bloques ya compactados (tuplas grados, ramas, códigos) sin pasar por float64."""
+        bloques = list(bloques)
+        if not bloques:
+            return cls([], [], asignaturas, np.zeros((0, len(asignaturas)), dtype=np.uint8))
+        grados = union_categoricals([pd.Categorical(g) for g, _, _ in bloques])
+        ramas = union_categoricals([pd.Categorical(r) for _, r, _ in bloques])
+        return cls(grados, ramas, asignaturas, np.concatenate([c for _, _, c in bloques]))
+
+    def __len__(self):
+        return len(self.codigos)
+
+    @property
+    def nbytes(self):
+        return int(self.codigos.nbytes + self.grados.nbytes + self.ramas.nbytes)
+
+    def columna(self, asignatura):
+        return self._columna.get(asignatura)
+
+    def ramas_unicas(self):
+        return sorted(self.ramas.categories[np.unique(self.ramas.codes)])
+
+    def filas_de_rama(self, rama):
+        if rama not in self.ramas.categories:
+            return np.array([], dtype=np.intp)
+        return np.flatnonzero(self.ramas.codes == self.ramas.categories.get_loc(rama))
+
+    def filas_de_grado(self, grado):
+        if self._filas_por_grado is None:
+            self._filas_por_grado = pd.Series(np.arange(len(self))).groupby(self.grados.codes).indices
+        if grado not in self.grados.categories:
+            return np.array([], dtype=np.intp)
+        return np.asarray(self._filas_por_grado.get(self.grados.categories.get_loc(grado), []), dtype=np.intp)
+
+    def perfiles(self):
+        """Perfiles de ponderación del dataset (PerfilesPonderacion), calculados la primera vez que se piden."""
+        if self._perfiles is None:
+            self._perfiles = PerfilesPonderacion(self)
+        return self._perfiles
+
+    def registro(self, grado):
+        """Primer registro del grado (como `df[df['Grado'] == grado].iloc[0]`), o None."""
+        filas = self.filas_de_grado(grado)
+        return RegistroGrado(self, int(filas[0])) if len(filas) else None
+
+    def pesos(self, filas=None, columnas=None):
+        """Ponderaciones decodificadas (float64) de las filas y asignaturas pedidas."""
+        codigos = self.codigos if filas is None else self.codigos[filas]
+        if columnas is not None:
+            codigos = codigos[:, [self._columna[c] for c in columnas]]
+        return TABLA_PONDERACIONES[codigos]
+
+    def a_dataframe(self, filas=None, columnas=None):
+        """DataFrame con el formato de siempre (Grado, Rama_de_conocimiento, asignaturas) solo para lo pedido."""
+        columnas = self.asignaturas if columnas is None else list(columnas)
+        grados = self.grados if filas is None else self.grados[filas]
+        ramas = self.ramas if filas is None else self.ramas[filas]
+        df = pd.DataFrame(self.pesos(filas, columnas), columns=columnas)
+        df.insert(0, COLUMNAS_ID[1], np.asarray(ramas, dtype=object))
+        df.insert(0, COLUMNAS_ID[0], np.asarray(grados, dtype=object))
+        return df
+
+    def desdoblar_rama(self, etiqueta, nuevas_ramas):
+        """
+        Repite cada fila con rama `etiqueta` una vez por cada elemento de `nuevas_ramas`
+        (en su posición original), p. ej. 'IyA+C' -> 'Ingeniería y Arquitectura' y 'Ciencias'.
+        """
+        es_doble = np.asarray(self.ramas == etiqueta)
+        if not es_doble.any():
+            return self
+        repeticiones = np.where(es_doble, len(nuevas_ramas), 1)
+        filas = np.repeat(np.arange(len(self)), repeticiones)
+        ramas = np.asarray(self.ramas, dtype=object)[filas]
+        copia = np.arange(len(filas)) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+        dobles = es_doble[filas]
+        ramas[dobles] = np.asarray(nuevas_ramas, dtype=object)[copia[dobles]]
+        return DatasetCompacto(self.grados[filas], ramas, self.asignaturas, self.codigos[filas])
+
+    def desdoblar_ramas(self, desdobles):
+        """Aplica desdoblar_rama a cada etiqueta de `desdobles` ({etiqueta: ramas})."""
+        dataset = self
+        for etiqueta, nuevas_ramas in desdobles.items():
+            dataset = dataset.desdoblar_rama(etiqueta, nuevas_ramas)
+        return dataset
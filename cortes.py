@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+from busqueda import normalizar_texto
+from calculadora import MAX_ESPECIFICAS, NOTA_MINIMA_ESPECIFICA, PESO_BACHILLERATO, PESO_FASE_GENERAL
+from ingesta import CODIFICACIONES, IncidenciaIngesta
+
+# --- Notas de corte históricas y probabilidad de admisión ---
+
+COLUMNAS_CORTE = ['Grado', 'Universidad', 'Año', 'Nota_Corte']
+
+# Cabeceras aceptadas (ya normalizadas: sin tildes ni mayúsculas)
+_ALIAS_COLUMNAS = {
+    'grado': 'Grado', 'titulacion': 'Grado',
+    'universidad': 'Universidad',
+    'ano': 'Año', 'anio': 'Año', 'curso': 'Año',
+    'nota corte': 'Nota_Corte', 'nota de corte': 'Nota_Corte', 'corte': 'Nota_Corte',
+}
+
+NOTA_CORTE_MIN = 5.0
+NOTA_CORTE_MAX = 14.0
+
+ULTIMOS_ANIOS = 3
+# Variación interanual que se supone cuando solo hay un año de histórico
+DESVIACION_CORTE_POR_DEFECTO = 0.25
+TAM_BLOQUE_MUESTRAS = 1000
+
+
+class NotasCorte:
+    """Notas de corte (grado, universidad, año) indexadas por grado."""
+
+    def __init__(self, df):
+        self._df = df.sort_values(['Grado', 'Universidad', 'Año'], ignore_index=True)
+        self._filas_por_grado = self._df.groupby('Grado').indices
+
+    def __len__(self):
+        return len(self._df)
+
+    def grados(self):
+        return list(self._filas_por_grado)
+
+    def historico(self, grado):
+        return self._df.iloc[self._filas_por_grado.get(grado, [])]
+
+    def resumen(self, ultimos_anios=ULTIMOS_ANIOS):
+        """
+        Una fila por (Grado, Universidad) con el último año y su nota, y la media y
+        desviación de los `ultimos_anios` más recientes, que modelan el corte esperado.
+        """
+        recientes = self._df.groupby(['Grado', 'Universidad'], sort=False).tail(ultimos_anios)
+        agrupado = recientes.groupby(['Grado', 'Universidad'], sort=True)
+        resumen = agrupado.agg(Año=('Año', 'last'), Nota_Corte=('Nota_Corte', 'last'),
+                               Media=('Nota_Corte', 'mean'), Desviacion=('Nota_Corte', 'std'))
+        resumen['Desviacion'] = resumen['Desviacion'].fillna(DESVIACION_CORTE_POR_DEFECTO)
+        return resumen.reset_index()
+
+
+def _columnas_corte(columnas):
+    renombrar = {}
+    for columna in columnas:
+        destino = _ALIAS_COLUMNAS.get(normalizar_texto(columna))
+        if destino and destino not in renombrar.values():
+            renombrar[columna] = destino
+    faltan = [c for c in COLUMNAS_CORTE if c not in renombrar.values()]
+    if faltan:
+        raise ValueError(f"Al CSV de notas de corte le faltan columnas: {', '.join(faltan)}.")
+    return renombrar
+
+
+def _leer_notas_corte(filepath, codificacion):
+    df = pd.read_csv(filepath, encoding=codificacion, sep=None, engine='python', dtype=str)
+    df = df.rename(columns=_columnas_corte(df.columns))[COLUMNAS_CORTE]
+    for columna in ('Grado', 'Universidad'):
+        df[columna] = df[columna].str.strip()
+    anio = pd.to_numeric(df['Año'].str.strip().str[:4], errors='coerce')
+    nota = pd.to_numeric(df['Nota_Corte'].str.strip().str.replace(',', '.', regex=False), errors='coerce')
+
+    incidencias = []
+    validas = np.ones(len(df), dtype=bool)
+    for motivo, malas in (
+        ("Fila sin grado o universidad", (df['Grado'].isna() | df['Universidad'].isna()).to_numpy()),
+        ("Año no válido", anio.isna().to_numpy()),
+        (f"Nota de corte fuera de [{NOTA_CORTE_MIN}, {NOTA_CORTE_MAX}] o no numérica",
+         ~nota.between(NOTA_CORTE_MIN, NOTA_CORTE_MAX).to_numpy()),
+    ):
+        for i in np.flatnonzero(validas & malas):
+            incidencias.append(IncidenciaIngesta(int(i) + 1, df['Grado'].iloc[i], motivo))
+        validas &= ~malas
+
+    limpio = df.loc[validas, ['Grado', 'Universidad']].copy()
+    limpio['Año'] = anio[validas].astype(int)
+    limpio['Nota_Corte'] = nota[validas].astype(float)
+    limpio = limpio.drop_duplicates(['Grado', 'Universidad', 'Año'], keep='last')
+    return NotasCorte(limpio), incidencias
+
+
+def leer_notas_corte(filepath, codificaciones=CODIFICACIONES):
+    """
+    Lee un CSV local de notas de corte (Grado, Universidad, Año, Nota_Corte; se
+    admiten coma decimal, separador ',' o ';' y cursos tipo '2023-24').
+    Devuelve (NotasCorte, incidencias). Lanza FileNotFoundError si no existe y
+    ValueError si faltan columnas o ninguna codificación sirve.
+    """
+    for codificacion in codificaciones:
+        try:
+            return _leer_notas_corte(filepath, codificacion)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"No se pudo decodificar '{filepath}' con ninguna de las codificaciones {codificaciones}.")
+
+
+# --- Motor Monte Carlo ---
+
+def probabilidades_admision(dataset, notas_corte, nota_bachillerato, nota_fase_general, notas,
+                            desviacion_bachillerato=0.0, desviacion_fase_general=0.5, desviacion_especificas=0.75,
+                            muestras=5000, ultimos_anios=ULTIMOS_ANIOS, semilla=None):
+    """
+    Probabilidad de superar la nota de corte en cada (grado, universidad) a la vez.
+
+    Cada muestra simula las notas del alumno (normales centradas en las notas
+    previstas, recortadas a [0, 10]) y el corte de ese año (normal con la media y
+    la desviación de los últimos años). La nota de admisión se calcula con las
+    mismas reglas que la calculadora para todos los grados en bloque: matriz
+    muestras x perfiles x asignaturas y las dos mejores aportaciones por perfil
+    de ponderación (los grados con el mismo perfil comparten la nota simulada).
+
+    Devuelve (DataFrame, grados_sin_ponderaciones): el DataFrame tiene Grado,
+    Universidad, Año, Nota_Corte (último año), Nota_Estimada (media simulada) y
+    Probabilidad, ordenado de mayor a menor probabilidad.
+    """
+    resumen = notas_corte.resumen(ultimos_anios)
+    fila_de_grado = {g: dataset.filas_de_grado(g) for g in resumen['Grado'].unique()}
+    sin_ponderaciones = sorted(g for g, filas in fila_de_grado.items() if len(filas) == 0)
+    resumen = resumen[~resumen['Grado'].isin(sin_ponderaciones)].reset_index(drop=True)
+    columnas = pd.DataFrame(columns=['Grado', 'Universidad', 'Año', 'Nota_Corte', 'Nota_Estimada', 'Probabilidad'])
+    if resumen.empty:
+        return columnas, sin_ponderaciones
+
+    # Cada grado se puntúa una vez aunque tenga cortes en varias universidades
+    grados_unicos, grado_de_corte = np.unique(resumen['Grado'].to_numpy(dtype=object), return_inverse=True)
+    filas = np.array([fila_de_grado[g][0] for g in grados_unicos])
+    perfiles, perfil_de_grado = dataset.perfiles().de_filas(filas)
+    asignaturas = [a for a in notas if dataset.columna(a) is not None]
+    pesos = dataset.perfiles().pesos(perfiles, asignaturas)  # perfiles x asignaturas
+    previstas = np.array([notas[a] for a in asignaturas], dtype=np.float64)
+    media_corte = resumen['Media'].to_numpy(dtype=np.float64)
+    desviacion_corte = resumen['Desviacion'].to_numpy(dtype=np.float64)
+
+    rng = np.random.default_rng(semilla)
+    admitidas = np.zeros(len(resumen))
+    suma_notas = np.zeros(len(perfiles))
+    for inicio in range(0, muestras, TAM_BLOQUE_MUESTRAS):
+        b = min(TAM_BLOQUE_MUESTRAS, muestras - inicio)
+        bach = np.clip(rng.normal(nota_bachillerato, desviacion_bachillerato, b), 0, 10)
+        fase = np.clip(rng.normal(nota_fase_general, desviacion_fase_general, b), 0, 10)
+        base = PESO_BACHILLERATO * bach + PESO_FASE_GENERAL * fase
+        nota = np.repeat(base[:, None], len(perfiles), axis=1)
+        if asignaturas:
+            especificas = np.clip(rng.normal(previstas, desviacion_especificas, (b, len(asignaturas))), 0, 10)
+            especificas[especificas < NOTA_MINIMA_ESPECIFICA] = 0.0
+            aportes = especificas[:, None, :] * pesos[None, :, :]  # muestras x perfiles x asignaturas
+            if len(asignaturas) > MAX_ESPECIFICAS:
+                aportes = -np.partition(-aportes, MAX_ESPECIFICAS - 1, axis=2)[:, :, :MAX_ESPECIFICAS]
+            nota += aportes.sum(axis=2)
+        corte = rng.normal(media_corte, desviacion_corte, (b, len(resumen)))
+        admitidas += (nota[:, perfil_de_grado[grado_de_corte]] >= corte).sum(axis=0)
+        suma_notas += nota.sum(axis=0)
+
+    resultado = resumen[['Grado', 'Universidad', 'Año', 'Nota_Corte']].copy()
+    resultado['Nota_Estimada'] = (suma_notas / muestras)[perfil_de_grado[grado_de_corte]]
+    resultado['Probabilidad'] = admitidas / muestras
+    resultado = resultado.sort_values(['Probabilidad', 'Grado', 'Universidad'], ascending=[False, True, True], ignore_index=True)
+    return resultado, sin_ponderaciones
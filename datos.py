@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+# --- Utilidades compartidas sobre el dataset de ponderaciones ---
+
+COLUMNAS_ID = ['Grado', 'Rama_de_conocimiento']
+
+# Códigos de rama de la leyenda del CSV
+RAMAS = {
+    'AyH': 'Artes y Humanidades',
+    'C': 'Ciencias',
+    'IyA': 'Ingeniería y Arquitectura',
+    'SD': 'Ciencias de la Salud',
+    'SyJ': 'Ciencias Sociales y Jurídicas',
+}
+_CODIGO_POR_NOMBRE = {nombre: codigo for codigo, nombre in RAMAS.items()}
+
+# Etiquetas de doble rama que las vistas por rama muestran como una fila por cada rama
+RAMAS_DESDOBLADAS = {'IyA+C': ('Ingeniería y Arquitectura', 'Ciencias')}
+
+# Únicos valores de ponderación que publica el distrito único andaluz
+NIVELES_PONDERACION = (0.1, 0.15, 0.2)
+
+
+def columnas_asignaturas(df):
+    """Devuelve las columnas de asignaturas de 2º Bach (todas salvo Grado y Rama)."""
+    return [col for col in df.columns if col not in COLUMNAS_ID]
+
+
+def componentes_rama(etiqueta):
+    """
+    Códigos de rama que forman una etiqueta ('C + SyJ' -> ['C', 'SyJ']).
+    Acepta tanto códigos como nombres completos; lo desconocido se deja tal cual.
+    """
+    partes = [p.strip() for p in str(etiqueta).split('+') if p.strip()]
+    return [_CODIGO_POR_NOMBRE.get(p, p) for p in partes]
+
+
+def normalizar_etiqueta_rama(etiqueta):
+    """Forma canónica de una etiqueta de rama: códigos ordenados y unidos por '+'."""
+    return '+'.join(sorted(componentes_rama(etiqueta)))
+
+
+_versiones = {}  # (ruta, mtime, tamaño) -> huella
+
+
+def version_dataset(filepath):
+    """
+    Huella del contenido del CSV. Sirve como clave de caché: cualquier índice
+    derivado se reconstruye solo cuando cambia el archivo, no en cada rerun.
+    Mientras no cambien la fecha de modificación ni el tamaño no se vuelve a leer.
+    """
+    info = os.stat(filepath)
+    clave = (os.path.abspath(filepath), info.st_mtime_ns, info.st_size)
+    if clave not in _versiones:
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+        _versiones[clave] = h.hexdigest()[:16]
+    return _versiones[clave]
@@ -0,0 +1,130 @@
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# --- Escritura de DOT (Graphviz) en flujo ---
+#
+# Nodos y aristas se escriben por bloques a partir de arrays (una columna por
+# atributo): las líneas de cada bloque se forman con operaciones de texto
+# vectorizadas de pandas y se vuelcan con writelines, sin una llamada por
+# elemento ni el DOT entero en memoria. La salida puede ser un archivo o la
+# entrada estándar de `dot` (ver renderizar).
+
+TAM_BLOQUE = 20000
+
+
+def citar(valor):
+    """Un valor como cadena DOT entre comillas."""
+    texto = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{texto}"'
+
+
+def _citar_serie(valores):
+    texto = pd.Series(np.asarray(valores, dtype=object)).astype(str)
+    texto = texto.str.replace('\\', '\\\\', regex=False).str.replace('"', '\\"', regex=False).str.replace('\n', '\\n', regex=False)
+    return '"' + texto + '"'
+
+
+def _atributos(attrs):
+    return ' '.join(f'{clave}={citar(valor)}' for clave, valor in attrs.items() if valor is not None)
+
+
+class EscritorDot:
+    """
+    Escribe un grafo DOT en `salida` (cualquier objeto de texto con write).
+
+    Los atributos de nodos y aristas se pasan como arrays de la misma longitud
+    que los ids (o un escalar, común a todos). Los subgrafos se abren con
+    `with escritor.subgrafo(...)` y se pueden anidar.
+    """
+
+    def __init__(self, salida, tam_bloque=TAM_BLOQUE):
+        self._salida = salida
+        self._tam_bloque = tam_bloque
+        self._nivel = 0
+
+    def _linea(self, texto):
+        self._salida.write('\t' * self._nivel + texto + '\n')
+
+    @contextmanager
+    def grafo(self, nombre=None, dirigido=True, comentario=None):
+        if comentario:
+            self._linea(f'// {comentario}')
+        cabecera = 'digraph' if dirigido else 'graph'
+        self._linea(f'{cabecera} {citar(nombre)} {{' if nombre else f'{cabecera} {{')
+        self._dirigido = dirigido
+        self._nivel += 1
+        yield self
+        self._nivel -= 1
+        self._linea('}')
+
+    @contextmanager
+    def subgrafo(self, nombre, **attrs):
+        self._linea(f'subgraph {citar(nombre)} {{')
+        self._nivel += 1
+        if attrs:
+            self.atributos('graph', **attrs)
+        yield self
+        self._nivel -= 1
+        self._linea('}')
+
+    def atributos(self, tipo, **attrs):
+        """Atributos por defecto de 'graph', 'node' o 'edge' en el ámbito actual."""
+        self._linea(f'{tipo} [{_atributos(attrs)}]')
+
+    def _escribir_bloques(self, cabeceras, attrs):
+        columnas = {k: (v if np.ndim(v) == 0 else np.asarray(v, dtype=object)) for k, v in attrs.items() if v is not None}
+        n = len(cabeceras)
+        sangria = '\t' * self._nivel
+        for inicio in range(0, n, self._tam_bloque):
+            fin = min(inicio + self._tam_bloque, n)
+            lineas = sangria + cabeceras.iloc[inicio:fin]
+            partes = []
+            for clave, valores in columnas.items():
+                if np.ndim(valores) == 0:
+                    partes.append(pd.Series(f'{clave}={citar(valores)}', index=lineas.index))
+                else:
+                    partes.append(f'{clave}=' + _citar_serie(valores[inicio:fin]).set_axis(lineas.index))
+            if partes:
+                lineas = lineas + ' [' + partes[0].str.cat(partes[1:], sep=' ') + ']'
+            self._salida.writelines((lineas + '\n').tolist())
+
+    def nodos(self, ids, **attrs):
+        """Un nodo por id, con atributos por columna (p. ej. label=array, color='#FFDAB9')."""
+        self._escribir_bloques(_citar_serie(ids), attrs)
+
+    def aristas(self, origenes, destinos, **attrs):
+        """Una arista por par (origen, destino), con atributos por columna."""
+        flecha = ' -> ' if self._dirigido else ' -- '
+        self._escribir_bloques(_citar_serie(origenes) + flecha + _citar_serie(destinos), attrs)
+
+
+def dot_disponible():
+    return shutil.which('dot') is not None
+
+
+@contextmanager
+def renderizar(ruta_salida, formato='png', motor='dot'):
+    """
+    Abre `motor` (dot) escribiendo en `ruta_salida` y da su entrada estándar
+    para volcar el DOT en flujo; al salir espera a que termine. Lanza
+    RuntimeError si Graphviz no está instalado o falla al renderizar.
+    """
+    if shutil.which(motor) is None:
+        raise RuntimeError(f"No se encontró el ejecutable '{motor}' de Graphviz; instálalo para renderizar el diagrama.")
+    # stderr a un archivo: si fuera una tubería, muchos avisos de dot podrían bloquearlo mientras escribimos
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as errores:
+        proceso = subprocess.Popen([motor, f'-T{formato}', '-o', ruta_salida], stdin=subprocess.PIPE,
+                                   stderr=errores, text=True, encoding='utf-8')
+        try:
+            yield proceso.stdin
+        finally:
+            proceso.stdin.close()
+            proceso.wait()
+        if proceso.returncode != 0:
+            errores.seek(0)
+            raise RuntimeError(f"Graphviz terminó con error ({proceso.returncode}): {errores.read().strip()}")
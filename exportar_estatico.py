@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from busqueda import normalizar_texto
+from compacto import TABLA_PONDERACIONES
+from datos import COLUMNAS_ID, RAMAS, RAMAS_DESDOBLADAS, componentes_rama, version_dataset
+from grafo import generar_diagrama_networkx_pyvis
+from ingesta import leer_ponderaciones
+from tabla import TablaIndexada
+
+# --- Exportación estática de todas las vistas de solo lectura ---
+#
+# Genera en un directorio un sitio HTML que se puede servir desde cualquier
+# hosting estático: el gráfico de cada rama para cada umbral de ponderación,
+# la tabla de grados por rama, la vista "qué grados ponderan" de cada
+# asignatura, la leyenda de ramas y una calculadora de nota que se ejecuta en
+# el navegador. Los gráficos se generan en paralelo y solo se reescriben los
+# archivos cuyo contenido ha cambiado.
+
+DIRECTORIO_SALIDA = 'estatico'
+MANIFIESTO = 'manifest.json'
+
+# Umbrales del gráfico, igual que la casilla "Incluir ponderación 0.1" de la app
+UMBRALES_GRAFO = {
+    '02': ("Solo ponderación 0.2", False),
+    'todas': ("Todas las ponderaciones", True),
+}
+
+_ESTILO = """
+body { font-family: Arial, sans-serif; margin: 1.5em; color: #222; }
+table { border-collapse: collapse; font-size: 0.85em; }
+th, td { border: 1px solid #ccc; padding: 3px 6px; }
+th { background: #f0f0f0; position: sticky; top: 0; }
+td.num { text-align: center; }
+nav { margin-bottom: 1em; }
+label { display: inline-block; min-width: 16em; }
+"""
+
+
+def slug(texto):
+    """Nombre de archivo seguro: 'Ciencias de la Salud' -> 'ciencias-de-la-salud'."""
+    return re.sub(r'[^a-z0-9]+', '-', normalizar_texto(texto)).strip('-') or 'x'
+
+
+def nombre_asignatura(asig):
+    return asig.replace('_', ' ').replace('.', ' ')
+
+
+def nombre_rama(rama):
+    nombre = ' + '.join(RAMAS.get(c, c) for c in componentes_rama(rama))
+    return rama if nombre == rama else f"{nombre} ({rama})"
+
+
+def pagina(titulo, cuerpo, volver=True):
+    nav = '<nav><a href="index.html">&larr; Índice</a></nav>' if volver else ''
+    return (f'<!DOCTYPE html>\n<html lang="es"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f'<title>{html.escape(titulo)}</title><style>{_ESTILO}</style></head>\n'
+            f'<body>{nav}<h1>{html.escape(titulo)}</h1>\n{cuerpo}\n</body></html>\n')
+
+
+def _celda_ponderacion(valor):
+    return f'<td class="num">{valor:g}</td>' if valor > 0 else '<td></td>'
+
+
+def tabla_html(df):
+    """Tabla HTML de ponderaciones: los ceros se dejan en blanco para que se lean los que ponderan."""
+    columnas = list(df.columns)
+    cabecera = ''.join(f'<th>{html.escape(nombre_asignatura(c))}</th>' for c in columnas)
+    filas = []
+    for fila in df.itertuples(index=False):
+        celdas = ''.join(
+            f'<td>{html.escape(str(v))}</td>' if c in COLUMNAS_ID else _celda_ponderacion(v)
+            for c, v in zip(columnas, fila)
+        )
+        filas.append(f'<tr>{celdas}</tr>')
+    return f'<table><thead><tr>{cabecera}</tr></thead><tbody>\n' + '\n'.join(filas) + '\n</tbody></table>'
+
+
+# --- Vistas ---
+
+def _renderizar_grafo(tarea):
+    """Se ejecuta en un proceso aparte: (ruta, df de la rama, rama, incluir 0.1) -> (ruta, html)."""
+    ruta, df_rama, rama, mostrar_01 = tarea
+    contenido = generar_diagrama_networkx_pyvis(df_rama, rama, mostrar_ponderacion_01=mostrar_01, alto_px=800)
+    return ruta, contenido
+
+
+def vistas_tablas(dataset):
+    """{ruta: html} de la tabla de grados de cada rama (y de todas) y de la vista por asignatura."""
+    vistas = {}
+    tabla = TablaIndexada(dataset)
+    for rama in [None] + dataset.ramas_unicas():
+        df, total, _ = tabla.consultar(rama=rama, tam_pagina=max(1, len(dataset)), ocultar_columnas_vacias=True)
+        titulo = "Ponderaciones: todos los grados" if rama is None else f"Ponderaciones: {nombre_rama(rama)}"
+        ruta = 'tablas/todas.html' if rama is None else f'tablas/rama-{slug(rama)}.html'
+        vistas[ruta] = pagina(titulo, f'<p>{total} grados.</p>\n' + tabla_html(df))
+
+    for j, asig in enumerate(dataset.asignaturas):
+        filas = np.flatnonzero(dataset.codigos[:, j])
+        df = dataset.a_dataframe(filas=filas, columnas=[asig])
+        df = df.drop_duplicates().sort_values([asig, 'Grado'], ascending=[False, True])
+        cuerpo = f'<p>{df["Grado"].nunique()} grados ponderan esta asignatura.</p>\n' + tabla_html(df)
+        vistas[f'asignaturas/{slug(asig)}.html'] = pagina(f"Qué grados ponderan {nombre_asignatura(asig)}", cuerpo)
+    return vistas
+
+
+def vista_leyenda(resultado):
+    titulo = resultado.titulo_leyenda or "Leyenda Ramas"
+    leyenda = resultado.leyenda or RAMAS
+    elementos = ''.join(f'<li><b>{html.escape(c)}</b>: {html.escape(n)}</li>' for c, n in leyenda.items())
+    return pagina(titulo, f'<ul>{elementos}</ul>')
+
+
+_SCRIPT_CALCULADORA = """
+const D = JSON.parse(document.getElementById('datos').textContent);
+const $ = (id) => document.getElementById(id);
+const nombre = (a) => D.asignaturas[a];
+function rellenarGrados() {
+  const sel = $('grado');
+  Object.keys(D.grados).sort((a, b) => a.localeCompare(b, 'es')).forEach((g) => sel.add(new Option(g, g)));
+}
+function rellenarAsignaturas() {
+  const pond = D.grados[$('grado').value] || [];
+  for (const id of ['asig1', 'asig2']) {
+    const sel = $(id), previa = sel.value;
+    sel.length = 0;
+    sel.add(new Option('Ninguna', ''));
+    pond.forEach(([a, p]) => sel.add(new Option(`${nombre(a)} (Pondera: ${p})`, a)));
+    sel.value = [...sel.options].some((o) => o.value === previa) ? previa : '';
+  }
+  calcular();
+}
+function calcular() {
+  const pond = Object.fromEntries(D.grados[$('grado').value] || []);
+  const bach = parseFloat($('bach').value) || 0, fase = parseFloat($('fase').value) || 0;
+  const base = 0.6 * bach + 0.4 * fase;
+  const notas = {};
+  for (const n of ['1', '2']) {
+    const a = $('asig' + n).value;
+    if (a !== '') notas[a] = parseFloat($('nota' + n).value) || 0;
+  }
+  const aportes = Object.entries(notas)
+    .filter(([a, nota]) => nota >= 5 && pond[a] > 0)
+    .map(([a, nota]) => ({a, nota, p: pond[a], c: pond[a] * nota}))
+    .sort((x, y) => y.c - x.c).slice(0, 2);
+  const especifica = aportes.reduce((s, x) => s + x.c, 0);
+  $('resultado').textContent = (base + especifica).toFixed(3);
+  $('desglose').innerHTML =
+    `<li>Componente Bachillerato (60%): ${(0.6 * bach).toFixed(3)}</li>` +
+    `<li>Componente Fase General (40%): ${(0.4 * fase).toFixed(3)}</li>` +
+    `<li><b>Subtotal Nota Base (sobre 10): ${base.toFixed(3)}</b></li>` +
+    `<li>Suma de ponderaciones de asignaturas específicas (sobre 4): ${especifica.toFixed(3)}</li>` +
+    aportes.map((x) => `<li>${nombre(x.a)}: Nota ${x.nota.toFixed(1)}, Ponderación ${x.p}, Aporta: ${x.c.toFixed(3)}</li>`).join('');
+}
+rellenarGrados();
+$('grado').addEventListener('change', rellenarAsignaturas);
+for (const id of ['bach', 'fase', 'asig1', 'asig2', 'nota1', 'nota2']) $(id).addEventListener('input', calcular);
+rellenarAsignaturas();
+"""
+
+
+def vista_calculadora(dataset):
+    """Calculadora de nota de acceso en el navegador, con las ponderaciones de cada grado incrustadas."""
+    grados = {}
+    for i in range(len(dataset)):
+        grado = dataset.grados[i]
+        if grado not in grados:
+            fila = dataset.codigos[i]
+            grados[grado] = [[int(j), float(TABLA_PONDERACIONES[fila[j]])] for j in np.flatnonzero(fila)]
+    datos = {'asignaturas': [nombre_asignatura(a) for a in dataset.asignaturas], 'grados': grados}
+    datos_json = json.dumps(datos, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    cuerpo = f"""
+<p><label for="grado">Grado universitario:</label> <select id="grado"></select></p>
+<p><label for="bach">Nota media de Bachillerato (sobre 10):</label> <input id="bach" type="number" min="0" max="10" step="0.01" value="7.5"></p>
+<p><label for="fase">Nota de la Fase General (sobre 10):</label> <input id="fase" type="number" min="0" max="10" step="0.01" value="7.0"></p>
+<p><label for="asig1">Asignatura específica 1:</label> <select id="asig1"></select> <input id="nota1" type="number" min="0" max="10" step="0.1" value="0"></p>
+<p><label for="asig2">Asignatura específica 2:</label> <select id="asig2"></select> <input id="nota2" type="number" min="0" max="10" step="0.1" value="0"></p>
+<h2>Nota final (sobre 14): <span id="resultado"></span></h2>
+<ul id="desglose"></ul>
+<p><small>Solo las asignaturas específicas con nota &ge; 5.0 contribuyen; se eligen las dos que más aporten.</small></p>
+<script type="application/json" id="datos">{datos_json}</script>
+<script>{_SCRIPT_CALCULADORA}</script>"""
+    return pagina("Calculadora de Nota de Acceso", cuerpo)
+
+
+def vista_indice(dataset, version):
+    secciones = ['<h2>Gráficos por rama</h2><ul>']
+    for rama in dataset.ramas_unicas():
+        enlaces = ' · '.join(f'<a href="graficos/{slug(rama)}-{clave}.html">{html.escape(texto)}</a>'
+                             for clave, (texto, _) in UMBRALES_GRAFO.items())
+        secciones.append(f'<li>{html.escape(nombre_rama(rama))}: {enlaces}</li>')
+    secciones.append('</ul><h2>Tablas de ponderaciones</h2><ul><li><a href="tablas/todas.html">Todos los grados</a></li>')
+    secciones += [f'<li><a href="tablas/rama-{slug(r)}.html">{html.escape(nombre_rama(r))}</a></li>' for r in dataset.ramas_unicas()]
+    secciones.append('</ul><h2>Qué grados ponderan cada asignatura</h2><ul>')
+    secciones += [f'<li><a href="asignaturas/{slug(a)}.html">{html.escape(nombre_asignatura(a))}</a></li>' for a in dataset.asignaturas]
+    secciones.append('</ul><h2>Otros</h2><ul><li><a href="leyenda.html">Leyenda de ramas</a></li>'
+                     '<li><a href="calculadora.html">Calculadora de nota de acceso</a></li></ul>')
+    secciones.append(f'<p><small>Versión de datos {version}.</small></p>')
+    return pagina("Visor de Ponderaciones para Selectividad (Andalucía)", '\n'.join(secciones), volver=False)
+
+
+# --- Escritura incremental ---
+
+def escribir_si_cambia(salida, ruta, contenido):
+    """Escribe `contenido` en salida/ruta solo si difiere de lo que ya hay (escritura atómica). Devuelve True si escribe."""
+    destino = os.path.join(salida, ruta)
+    datos = contenido.encode('utf-8')
+    try:
+        with open(destino, 'rb') as f:
+            if f.read() == datos:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(destino) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, destino)
+    return True
+
+
+def exportar(filepath='ponderaciones_andalucia.csv', salida=DIRECTORIO_SALIDA, procesos=None):
+    """Genera el sitio estático completo en `salida`. Devuelve (escritos, sin_cambios, eliminados)."""
+    resultado = leer_ponderaciones(filepath, compacto=True)
+    dataset = resultado.dataset.desdoblar_ramas(RAMAS_DESDOBLADAS)
+    version = version_dataset(filepath)
+
+    tareas = []
+    for rama in dataset.ramas_unicas():
+        df_rama = dataset.a_dataframe(filas=dataset.filas_de_rama(rama))
+        for clave, (_, mostrar_01) in UMBRALES_GRAFO.items():
+            tareas.append((f'graficos/{slug(rama)}-{clave}.html', df_rama, rama, mostrar_01))
+
+    vistas = {'index.html': vista_indice(dataset, version),
+              'leyenda.html': vista_leyenda(resultado),
+              'calculadora.html': vista_calculadora(dataset)}
+    vistas.update(vistas_tablas(dataset))
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        for ruta, contenido in ejecutor.map(_renderizar_grafo, tareas):
+            vistas[ruta] = contenido or pagina("Gráfico vacío", "<p>No hay datos para esta rama con este umbral.</p>")
+
+    escritos = sum(escribir_si_cambia(salida, ruta, contenido) for ruta, contenido in vistas.items())
+
+    # Los archivos de una exportación anterior que ya no existen (p. ej. una rama retirada) se borran
+    manifiesto = {ruta: hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16] for ruta, contenido in sorted(vistas.items())}
+    ruta_manifiesto = os.path.join(salida, MANIFIESTO)
+    try:
+        with open(ruta_manifiesto, encoding='utf-8') as f:
+            anterior = json.load(f).get('archivos', {})
+    except (FileNotFoundError, ValueError):
+        anterior = {}
+    eliminados = 0
+    for ruta in set(anterior) - set(manifiesto):
+        try:
+            os.remove(os.path.join(salida, ruta))
+            eliminados += 1
+        except FileNotFoundError:
+            pass
+    escribir_si_cambia(salida, MANIFIESTO, json.dumps({'version': version, 'archivos': manifiesto}, ensure_ascii=False, indent=1))
+    return escritos, len(vistas) - escritos, eliminados
+
+
+# --- SCRIPT PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta todas las vistas de solo lectura como sitio estático.")
+    parser.add_argument('--csv', default='ponderaciones_andalucia.csv')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA)
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos para generar los gráficos (por defecto, uno por CPU).")
+    args = parser.parse_args()
+
+    escritos, sin_cambios, eliminados = exportar(args.csv, args.salida, args.procesos)
+    print(f"Exportación en '{args.salida}': {escritos} archivos escritos, {sin_cambios} sin cambios, {eliminados} eliminados.")
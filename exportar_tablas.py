@@ -0,0 +1,296 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from compacto import TABLA_PONDERACIONES
+from datos import componentes_rama
+from grafo import RELACIONES_1_A_2
+from ingesta import leer_ponderaciones
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sin pyarrow solo se puede exportar GraphML
+    pa = pq = None
+
+# --- Exportación del grafo de ponderaciones como tablas de nodos y aristas ---
+#
+# El grafo de tres capas ya limpio (1º Bach -> 2º Bach -> Grados) en tablas
+# columnares, para cargarlo en otras herramientas sin volver a procesar el CSV:
+#
+# - nodos:   id, capa ('1_bach', '2_bach', 'grado'), etiqueta
+# - aristas: origen, destino, tipo ('1_a_2', '2_a_grado'), ponderacion (nula en
+#            las 1º -> 2º) y fuente (el CSV del que sale; un CSV por año o distrito)
+# - ramas:   grado, rama (código) y fuente: pertenencia de cada grado a sus ramas
+#
+# Los ids, capas, tipos, ramas y fuentes se guardan con codificación de
+# diccionario: origen y destino son índices int32 sobre el mismo diccionario de
+# ids de nodo en todos los bloques, así que un lector de Arrow los carga sin
+# copiar (los .arrow se pueden mapear en memoria) y Parquet los comprime como
+# enteros pequeños. Las aristas salen por bloques de grados sin decodificar la
+# matriz entera de ponderaciones. Sin pyarrow solo está disponible GraphML.
+
+DIRECTORIO_SALIDA = 'tablas_grafo'
+FORMATOS = ('parquet', 'arrow', 'graphml')
+GRADOS_POR_BLOQUE = 4096
+CAPAS = ['1_bach', '2_bach', 'grado']
+TIPOS_ARISTA = ['1_a_2', '2_a_grado']
+
+
+# --- Lectura de las fuentes ---
+
+def leer_fuentes(rutas):
+    """
+    Lista de (fuente, dataset compacto) de cada CSV. Cada ruta puede llevar su
+    etiqueta como 'etiqueta=ruta' (p. ej. '2024=ponderaciones_2024.csv'); si no,
+    la fuente es el nombre del archivo sin extensión.
+    """
+    fuentes = []
+    for ruta in rutas:
+        etiqueta, separador, archivo = ruta.partition('=')
+        if not separador:
+            etiqueta, archivo = os.path.splitext(os.path.basename(ruta))[0], ruta
+        resultado = leer_ponderaciones(archivo, compacto=True)
+        for incidencia in resultado.incidencias:
+            print(f"Aviso ({etiqueta}): fila {incidencia.fila} descartada: {incidencia.motivo}")
+        fuentes.append((etiqueta, resultado.dataset))
+    if len({etiqueta for etiqueta, _ in fuentes}) != len(fuentes):
+        raise ValueError("Las fuentes deben tener etiquetas distintas (usa 'etiqueta=ruta').")
+    return fuentes
+
+
+def _ponderaciones_por_grado(dataset):
+    """(nombres de grado, matriz grados x asignaturas de códigos): un grado en varias filas se une con el máximo."""
+    orden = np.argsort(dataset.grados.codes, kind='stable')
+    codigos_grado = dataset.grados.codes[orden]
+    inicios = np.flatnonzero(np.r_[True, codigos_grado[1:] != codigos_grado[:-1]])
+    matriz = np.maximum.reduceat(dataset.codigos[orden], inicios, axis=0) if len(orden) else dataset.codigos[:0]
+    return np.asarray(dataset.grados.categories[codigos_grado[inicios]], dtype=object), matriz
+
+
+class TablasGrafo:
+    """
+    Nodos (comunes a todas las fuentes), pertenencia a ramas y aristas por
+    bloques. Los índices de origen y destino de las aristas y el grado de las
+    ramas son posiciones en `nodos`.
+    """
+
+    def __init__(self, fuentes, grados_por_bloque=GRADOS_POR_BLOQUE):
+        self.fuentes = fuentes
+        self.etiquetas_fuente = [etiqueta for etiqueta, _ in fuentes]
+        self.grados_por_bloque = grados_por_bloque
+        asignaturas = list(dict.fromkeys(a for _, dataset in fuentes for a in dataset.asignaturas))
+        grados = sorted({g for _, dataset in fuentes for g in dataset.grados.categories})
+        ids = ([f"1bach_{p}" for p in RELACIONES_1_A_2] + [f"2bach_{a}" for a in asignaturas]
+               + [f"grado_{g}" for g in grados])
+        etiquetas = [p.replace('_', ' ') for p in RELACIONES_1_A_2] + [a.replace('_', ' ') for a in asignaturas] + grados
+        capas = [0] * len(RELACIONES_1_A_2) + [1] * len(asignaturas) + [2] * len(grados)
+        self.nodos = pd.DataFrame({
+            'id': ids,
+            'capa': pd.Categorical.from_codes(capas, CAPAS),
+            'etiqueta': etiquetas,
+        })
+        self._indice = pd.Index(ids)
+        self.ramas = self._tabla_ramas()
+
+    def posiciones(self, ids):
+        return self._indice.get_indexer(ids).astype(np.int32)
+
+    def _tabla_ramas(self):
+        filas = set()
+        for f, (_, dataset) in enumerate(self.fuentes):
+            pares = pd.DataFrame({'grado': np.asarray(dataset.grados, dtype=object),
+                                  'rama': np.asarray(dataset.ramas, dtype=object)}).drop_duplicates()
+            for grado, etiqueta in pares.itertuples(index=False):
+                filas.update((grado, codigo, f) for codigo in componentes_rama(etiqueta))
+        filas = sorted(filas)
+        codigos = sorted({codigo for _, codigo, _ in filas})
+        return pd.DataFrame({
+            'grado': self.posiciones([f"grado_{g}" for g, _, _ in filas]),
+            'rama': pd.Categorical([c for _, c, _ in filas], categories=codigos),
+            'fuente': pd.Categorical.from_codes([f for _, _, f in filas], self.etiquetas_fuente),
+        })
+
+    def bloques_aristas(self):
+        """Genera DataFrames de aristas (origen, destino, tipo, ponderacion, fuente) por bloques de grados."""
+        for f, (_, dataset) in enumerate(self.fuentes):
+            asignaturas = set(dataset.asignaturas)
+            pares = [(p, s) for p, sucesores in RELACIONES_1_A_2.items() for s in sucesores if s in asignaturas]
+            yield self._bloque(self.posiciones([f"1bach_{p}" for p, _ in pares]),
+                               self.posiciones([f"2bach_{s}" for _, s in pares]), 0, np.nan, f)
+
+            grados, matriz = _ponderaciones_por_grado(dataset)
+            columnas = self.posiciones([f"2bach_{a}" for a in dataset.asignaturas])
+            filas_grado = self.posiciones([f"grado_{g}" for g in grados])
+            for inicio in range(0, len(grados), self.grados_por_bloque):
+                bloque = matriz[inicio:inicio + self.grados_por_bloque]
+                i, j = np.nonzero(bloque)
+                ponderaciones = TABLA_PONDERACIONES[bloque[i, j]].astype(np.float32)
+                yield self._bloque(columnas[j], filas_grado[inicio + i], 1, ponderaciones, f)
+
+    def _bloque(self, origenes, destinos, tipo, ponderaciones, fuente):
+        n = len(origenes)
+        return pd.DataFrame({
+            'origen': origenes,
+            'destino': destinos,
+            'tipo': pd.Categorical.from_codes(np.full(n, tipo, dtype=np.int8), TIPOS_ARISTA),
+            'ponderacion': np.broadcast_to(np.float32(ponderaciones) if np.ndim(ponderaciones) == 0 else ponderaciones, n),
+            'fuente': pd.Categorical.from_codes(np.full(n, fuente, dtype=np.int8), self.etiquetas_fuente),
+        })
+
+
+# --- Parquet y Arrow ---
+
+def _requiere_pyarrow(formato):
+    if pa is None:
+        raise RuntimeError(f"El formato '{formato}' necesita pyarrow (pip install pyarrow); sin él usa 'graphml'.")
+
+
+def _diccionario(categorias):
+    return pa.array(list(categorias), pa.string())
+
+
+def _columna_diccionario(codigos, diccionario, tipo_indice):
+    return pa.DictionaryArray.from_arrays(pa.array(codigos, tipo_indice), diccionario)
+
+
+class _EscritorTabla:
+    """Escribe lotes con un esquema fijo en un Parquet (ParquetWriter) o un archivo Arrow IPC."""
+
+    def __init__(self, ruta, esquema, formato):
+        self._formato = formato
+        if formato == 'parquet':
+            self._escritor = pq.ParquetWriter(ruta, esquema, compression='zstd', use_dictionary=True)
+        else:
+            self._sumidero = pa.OSFile(ruta, 'wb')
+            self._escritor = pa.ipc.new_file(self._sumidero, esquema)
+
+    def escribir(self, lote):
+        if lote.num_rows:
+            self._escritor.write_batch(lote)
+
+    def cerrar(self):
+        self._escritor.close()
+        if self._formato == 'arrow':
+            self._sumidero.close()
+
+
+def escribir_arrow(tablas, salida, formato='parquet'):
+    """nodos, aristas y ramas en `salida` como Parquet o Arrow IPC (.arrow). Devuelve las rutas escritas."""
+    _requiere_pyarrow(formato)
+    ids = _diccionario(tablas.nodos['id'])
+    capas, tipos, fuentes = _diccionario(CAPAS), _diccionario(TIPOS_ARISTA), _diccionario(tablas.etiquetas_fuente)
+    tipo_ids = pa.dictionary(pa.int32(), pa.string())
+    tipo_pequeno = pa.dictionary(pa.int8(), pa.string())
+    esquemas = {
+        'nodos': pa.schema([('id', pa.string()), ('capa', tipo_pequeno), ('etiqueta', pa.string())]),
+        'aristas': pa.schema([('origen', tipo_ids), ('destino', tipo_ids), ('tipo', tipo_pequeno),
+                              ('ponderacion', pa.float32()), ('fuente', tipo_pequeno)]),
+        'ramas': pa.schema([('grado', tipo_ids), ('rama', tipo_pequeno), ('fuente', tipo_pequeno)]),
+    }
+    rutas = {nombre: os.path.join(salida, f"{nombre}.{formato}") for nombre in esquemas}
+
+    nodos = _EscritorTabla(rutas['nodos'], esquemas['nodos'], formato)
+    nodos.escribir(pa.record_batch([
+        ids,
+        _columna_diccionario(tablas.nodos['capa'].cat.codes, capas, pa.int8()),
+        pa.array(tablas.nodos['etiqueta'], pa.string()),
+    ], schema=esquemas['nodos']))
+    nodos.cerrar()
+
+    ramas = _EscritorTabla(rutas['ramas'], esquemas['ramas'], formato)
+    ramas.escribir(pa.record_batch([
+        _columna_diccionario(tablas.ramas['grado'], ids, pa.int32()),
+        _columna_diccionario(tablas.ramas['rama'].cat.codes, _diccionario(tablas.ramas['rama'].cat.categories), pa.int8()),
+        _columna_diccionario(tablas.ramas['fuente'].cat.codes, fuentes, pa.int8()),
+    ], schema=esquemas['ramas']))
+    ramas.cerrar()
+
+    aristas = _EscritorTabla(rutas['aristas'], esquemas['aristas'], formato)
+    for bloque in tablas.bloques_aristas():
+        aristas.escribir(pa.record_batch([
+            _columna_diccionario(bloque['origen'], ids, pa.int32()),
+            _columna_diccionario(bloque['destino'], ids, pa.int32()),
+            _columna_diccionario(bloque['tipo'].cat.codes, tipos, pa.int8()),
+            pa.array(bloque['ponderacion'], pa.float32(), from_pandas=True),
+            _columna_diccionario(bloque['fuente'].cat.codes, fuentes, pa.int8()),
+        ], schema=esquemas['aristas']))
+    aristas.cerrar()
+    return list(rutas.values())
+
+
+# --- GraphML ---
+
+def _xml(serie):
+    """Escapa una serie de textos para XML (vectorizado)."""
+    texto = pd.Series(serie, dtype=object).astype(str)
+    for caracter, entidad in (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;')):
+        texto = texto.str.replace(caracter, entidad, regex=False)
+    return texto
+
+
+def escribir_graphml(tablas, salida):
+    """Todo el grafo en un GraphML (las ramas de cada grado como atributo 'ramas'), escrito por bloques."""
+    ruta = os.path.join(salida, 'grafo.graphml')
+    ids = _xml(tablas.nodos['id'])
+    ramas_por_nodo = (tablas.ramas.assign(rama=tablas.ramas['rama'].astype(str))
+                      .drop_duplicates(['grado', 'rama']).groupby('grado')['rama'].agg(';'.join))
+    ramas = pd.Series('', index=tablas.nodos.index).where(~tablas.nodos.index.isin(ramas_por_nodo.index),
+                                                          ramas_por_nodo.reindex(tablas.nodos.index))
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                '<key id="capa" for="node" attr.name="capa" attr.type="string"/>\n'
+                '<key id="etiqueta" for="node" attr.name="etiqueta" attr.type="string"/>\n'
+                '<key id="ramas" for="node" attr.name="ramas" attr.type="string"/>\n'
+                '<key id="tipo" for="edge" attr.name="tipo" attr.type="string"/>\n'
+                '<key id="ponderacion" for="edge" attr.name="ponderacion" attr.type="double"/>\n'
+                '<key id="fuente" for="edge" attr.name="fuente" attr.type="string"/>\n'
+                '<graph id="ponderaciones" edgedefault="directed">\n')
+        lineas = ('<node id="' + ids + '"><data key="capa">' + tablas.nodos['capa'].astype(str)
+                  + '</data><data key="etiqueta">' + _xml(tablas.nodos['etiqueta'])
+                  + '</data><data key="ramas">' + _xml(ramas) + '</data></node>\n')
+        f.writelines(lineas.tolist())
+        for bloque in tablas.bloques_aristas():
+            ponderacion = pd.Series(bloque['ponderacion']).map(lambda p: '' if np.isnan(p) else f'<data key="ponderacion">{p:g}</data>')
+            lineas = ('<edge source="' + ids.iloc[bloque['origen']].to_numpy() + '" target="'
+                      + ids.iloc[bloque['destino']].to_numpy() + '"><data key="tipo">' + bloque['tipo'].astype(str)
+                      + '</data>' + ponderacion + '<data key="fuente">' + _xml(bloque['fuente']) + '</data></edge>\n')
+            f.writelines(lineas.tolist())
+        f.write('</graph>\n</graphml>\n')
+    return [ruta]
+
+
+def exportar_tablas(rutas_csv, salida=DIRECTORIO_SALIDA, formatos=FORMATOS):
+    """Exporta el grafo de las fuentes en los formatos pedidos. Devuelve {ruta: bytes}."""
+    for formato in formatos:
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconocido: {formato!r} (disponibles: {', '.join(FORMATOS)}).")
+        if formato != 'graphml':
+            _requiere_pyarrow(formato)
+    tablas = TablasGrafo(leer_fuentes(rutas_csv))
+    os.makedirs(salida, exist_ok=True)
+    escritas = []
+    for formato in formatos:
+        escritas += escribir_graphml(tablas, salida) if formato == 'graphml' else escribir_arrow(tablas, salida, formato)
+    return {ruta: os.path.getsize(ruta) for ruta in escritas}
+
+
+# --- SCRIPT PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el grafo de ponderaciones como tablas de nodos y aristas (Parquet, Arrow, GraphML).")
+    parser.add_argument('csv', nargs='*', default=['ponderaciones_andalucia.csv'],
+                        help="CSV de ponderaciones; varios (p. ej. uno por año) como 'etiqueta=ruta'.")
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA)
+    parser.add_argument('--formatos', default=','.join(FORMATOS) if pa is not None else 'graphml',
+                        help=f"Separados por comas, entre {', '.join(FORMATOS)}.")
+    args = parser.parse_args()
+
+    try:
+        escritas = exportar_tablas(args.csv, args.salida, [f.strip() for f in args.formatos.split(',') if f.strip()])
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        parser.exit(1, f"Error: {e}\n")
+    for ruta, tam in escritas.items():
+        print(f"{ruta}: {tam / 1024:.1f} KB")
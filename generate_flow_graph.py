@@ -1,40 +1,40 @@
+import hashlib
+import pathlib
+import sys
+import webbrowser
+
+import numpy as np
 import pandas as pd
-from graphviz import Digraph
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
-import math
 
-# --- FUNCIÓN PARA CARGAR Y LIMPIAR EL CSV (con UTF-8) ---
+import escritor_dot
+from cache_disco import CacheDisco, huella_codigo
+from datos import columnas_asignaturas
+from escritor_dot import EscritorDot, dot_disponible, renderizar
+from grafo import RELACIONES_1_A_2
+from ingesta import leer_ponderaciones
+
+# --- FUNCIÓN PARA CARGAR Y LIMPIAR EL CSV ---
 def cargar_y_limpiar_csv(filepath):
     try:
-        # Usar codificación UTF-8 como se solicitó
-        df = pd.read_csv(filepath, encoding='utf-8', on_bad_lines='skip')
+        resultado = leer_ponderaciones(filepath)
     except FileNotFoundError:
         print(f"Error: No se encontró el archivo '{filepath}'.")
         return None
-    except UnicodeDecodeError:
-        print("Error de decodificación. Probando con 'latin1' como alternativa.")
-        df = pd.read_csv(filepath, encoding='latin1', on_bad_lines='skip')
-
-
-    df.rename(columns={df.columns[0]: 'Grado'}, inplace=True)
-    df = df.dropna(subset=['Rama de conocimiento'])
-    df = df[~df['Grado'].str.contains("Pondera|No pondera|This work", case=False, na=False)]
-    
-    nuevas_columnas = {col: col.strip().replace(' ', '_').replace('-', '_') for col in df.columns}
-    df.rename(columns=nuevas_columnas, inplace=True)
-    
-    for col in df.columns[2:]:
-        if df[col].dtype == 'object':
-            df[col] = df[col].str.replace(',', '.', regex=False)
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    except ValueError as e:
+        print(f"Error al cargar el CSV: {e}")
+        return None
 
-    df.fillna(0.0, inplace=True)
+    if resultado.codificacion != 'utf-8':
+        print(f"Aviso: el archivo no está en UTF-8; se ha leído como '{resultado.codificacion}'.")
+    for incidencia in resultado.incidencias:
+        print(f"Aviso: fila {incidencia.fila} descartada: {incidencia.motivo}")
     
-    return df
+    return resultado.df
 
 # --- FUNCIÓN PARA CREAR DIAGRAMAS FILTRADOS POR RAMA ---
-def crear_diagrama_filtrado(df, rama_filter):
+def crear_diagrama_filtrado(df, rama_filter, cache=None):
     """
     Crea un diagrama de flujo de 3 capas (1º Bach -> 2º Bach -> Grados)
     filtrado por una rama de conocimiento.
@@ -45,11 +45,11 @@ def crear_diagrama_filtrado(df, rama_filter):
         return
         
     # Llamar a la función de dibujo con los datos filtrados
-    _dibujar_diagrama(df_filtrado, f'ruta_academica_{rama_filter.lower()}')
+    _dibujar_diagrama(df_filtrado, f'ruta_academica_{rama_filter.lower()}', cache=cache)
 
 
 # --- FUNCIÓN PARA CREAR EL DIAGRAMA GLOBAL ---
-def crear_diagrama_global(df):
+def crear_diagrama_global(df, cache=None):
     """
     Crea un diagrama de flujo global con todas las asignaturas y grados.
     ADVERTENCIA: El resultado será un archivo grande y complejo.
@@ -57,110 +57,172 @@ def crear_diagrama_global(df):
     print("\nADVERTENCIA: Generando el diagrama global. Esto puede tardar y el archivo resultante será muy grande y denso.")
     # Para hacerlo manejable, solo mostraremos las conexiones más fuertes (ponderación 0.2)
     # y limitaremos a un máximo de grados por asignatura para no saturar.
-    _dibujar_diagrama(df, 'ruta_academica_global', global_mode=True, max_grados_por_asignatura=10)
+    _dibujar_diagrama(df, 'ruta_academica_global', global_mode=True, max_grados_por_asignatura=10, cache=cache)
 
 
 # --- FUNCIÓN INTERNA DE DIBUJO (lógica compartida) ---
-def _dibujar_diagrama(df_data, output_filename, global_mode=False, max_grados_por_asignatura=None):
-    
-    # 1. Definir Relaciones 1º -> 2º Bach
-    relaciones_1_a_2 = {
-        'Matemáticas_I': ['Matemáticas_II'],
-        'Mates_Aplicadas_CCSS_I': ['Matemáticas_Aplicadas_CC.SS.'],
-        'Física_y_Química': ['Física', 'Química'],
-        'Biología_y_Geología': ['Biología', 'Geología_y_Ciencias_Ambientales'],
-        'Dibujo_Técnico_I': ['Dibujo_Técnico_II', 'Dibujo_Técnico_aplicado_a_las_artes_plásticas_y_al_diseño_II'],
-        'Latín_I': ['Latín_II'],
-        'Griego_I': ['Griego_II'],
-        'Economía': ['Empresa_y_Diseño_de_modelos_de_negocio'],
-        'Hª_Mundo_Contemporáneo': ['Historia_de_la_Filosofía', 'Historia_del_Arte', 'Geografía']
-    }
-
-    # 2. Asignar colores únicos a las asignaturas de 2º Bach
-    asignaturas_2_utiles = [col for col in df_data.columns[2:-1] if df_data[col].sum() > 0]
-    cmap = plt.cm.get_cmap('tab20', len(asignaturas_2_utiles))
-    color_asignatura = {asig: mcolors.to_hex(cmap(i)) for i, asig in enumerate(asignaturas_2_utiles)}
-    
-    # 3. Inicializar el Gráfico
-    dot = Digraph(comment='Flujo Académico')
-    dot.attr('graph', rankdir='LR', splines='curved', overlap='false', bgcolor='transparent')
-    if not global_mode:
-        dot.attr('graph', label=f'Ruta Académica para: {df_data["Rama_de_conocimiento"].iloc[0].split("+")[0]}', labelloc='t', fontsize='30')
+
+COLOR_GRADO = '#FFDAB9' # Color melocotón para los grados
+
+
+def tablas_diagrama(df_data, global_mode=False, max_grados_por_asignatura=None):
+    """
+    Nodos y aristas del diagrama como tablas, calculados en bloque sobre la
+    matriz de ponderaciones (sin recorrer filas ni ordenar por asignatura).
+
+    Devuelve (nodos, aristas):
+    - nodos: id, label, capa ('1_bach', '2_bach', 'grado'), rama (solo grados) y color.
+    - aristas: origen, destino, capa ('1_2', '2_grado'), ponderacion, color y penwidth.
+    """
+    # 1. Asignar colores únicos a las asignaturas de 2º Bach
+    asignaturas = columnas_asignaturas(df_data)
+    pesos = df_data[asignaturas].to_numpy(dtype=np.float64)
+    utiles = pesos.sum(axis=0) > 0
+    asignaturas_2_utiles = [a for a, util in zip(asignaturas, utiles) if util]
+    pesos = pesos[:, utiles]
+    cmap = plt.cm.get_cmap('tab20', max(len(asignaturas_2_utiles), 1))
+    colores_2 = np.array([mcolors.to_hex(cmap(i)) for i in range(len(asignaturas_2_utiles))], dtype=object)
+
+    # 2. Nodos: 1º Bach, 2º Bach y grados agrupados por rama
+    nodos_1 = list(RELACIONES_1_A_2)
+    grados = df_data[['Grado', 'Rama_de_conocimiento']].sort_values('Rama_de_conocimiento', kind='stable')
+    nodos = pd.concat([
+        pd.DataFrame({'id': nodos_1, 'label': [n.replace('_', ' ') for n in nodos_1], 'capa': '1_bach', 'rama': None, 'color': None}),
+        pd.DataFrame({'id': asignaturas_2_utiles, 'label': [n.replace('_', ' ') for n in asignaturas_2_utiles],
+                      'capa': '2_bach', 'rama': None, 'color': colores_2 + '80'}), # Color con transparencia
+        pd.DataFrame({'id': grados['Grado'].to_numpy(),
+                      'label': grados['Grado'].str.replace(' + ', '+\n', regex=False).str.replace(' y ', ' y\n', regex=False).str.replace(' de ', ' de\n', regex=False).to_numpy(),
+                      'capa': 'grado', 'rama': grados['Rama_de_conocimiento'].to_numpy(), 'color': COLOR_GRADO}),
+    ], ignore_index=True)
+
+    # 3. Aristas 1º Bach -> 2º Bach
+    pares_1_2 = [(p, s) for p, sucesores in RELACIONES_1_A_2.items() for s in sucesores if s in asignaturas_2_utiles]
+
+    # 4. Aristas 2º Bach -> Grados: ponderación mínima para dibujar una línea y, en
+    # modo global, solo los `max_grados_por_asignatura` grados con más ponderación
+    min_pond = 0.2 if global_mode else 0.1
+    mascara = pesos >= min_pond
+    if global_mode and max_grados_por_asignatura:
+        orden = np.argsort(-pesos, axis=0, kind='stable') # empates: primero el que aparece antes (como nlargest)
+        puesto = np.empty_like(orden)
+        np.put_along_axis(puesto, orden, np.arange(len(pesos))[:, None], axis=0)
+        mascara &= puesto < max_grados_por_asignatura
+    columnas, filas = np.nonzero(mascara.T) # agrupadas por asignatura
+    ponderaciones = pesos[filas, columnas]
+
+    aristas = pd.concat([
+        pd.DataFrame({'origen': [p for p, _ in pares_1_2], 'destino': [s for _, s in pares_1_2], 'capa': '1_2',
+                      'ponderacion': np.nan, 'color': None, 'penwidth': None}),
+        pd.DataFrame({'origen': np.array(asignaturas_2_utiles, dtype=object)[columnas],
+                      'destino': df_data['Grado'].to_numpy()[filas], 'capa': '2_grado',
+                      'ponderacion': ponderaciones, 'color': colores_2[columnas],
+                      'penwidth': np.where(ponderaciones == 0.2, '2.5', '1.0')}),
+    ], ignore_index=True)
+    return nodos, aristas
+
+
+def escribir_diagrama(salida, nodos, aristas, titulo, global_mode=False):
+    """Escribe en `salida` (archivo o entrada de `dot`) el DOT del diagrama a partir de sus tablas."""
+    dot = EscritorDot(salida)
+    with dot.grafo(comentario='Flujo Académico'):
+        dot.atributos('graph', rankdir='LR', splines='curved', overlap='false', bgcolor='transparent')
+        if not global_mode:
+            dot.atributos('graph', label=titulo, labelloc='t', fontsize='30')
+        else:
+            dot.atributos('graph', label=titulo, labelloc='t', fontsize='40', size="40,60", dpi="300")
+
+        # Capa 1: 1º Bachillerato
+        capa_1 = nodos[nodos['capa'] == '1_bach']
+        with dot.subgrafo('cluster_1', label='1º Bachillerato', style='filled', color='#F5F5F5'):
+            dot.atributos('node', shape='box', style='filled,rounded', color='#E8E8E8')
+            dot.nodos(capa_1['id'], label=capa_1['label'])
+
+        # Capa 2: 2º Bachillerato
+        capa_2 = nodos[nodos['capa'] == '2_bach']
+        with dot.subgrafo('cluster_2', label='2º Bachillerato (Asignaturas que ponderan)', style='filled', color='#E0E0E0'):
+            dot.atributos('node', shape='box', style='filled,rounded')
+            dot.nodos(capa_2['id'], label=capa_2['label'], color=capa_2['color'])
+
+        # Capa 4: Grados Universitarios (Agrupados por Rama)
+        capa_4 = nodos[nodos['capa'] == 'grado']
+        with dot.subgrafo('cluster_4', label='Grados Universitarios', style='filled', color='#D0D0D0'):
+            dot.atributos('node', shape='box', style='filled,rounded')
+            for rama, grados_en_rama in capa_4.groupby('rama', sort=True):
+                with dot.subgrafo(f'cluster_rama_{rama.replace(" ", "")}', label=rama, style='filled', color='#C8C8C8'):
+                    dot.nodos(grados_en_rama['id'], label=grados_en_rama['label'], color=grados_en_rama['color'])
+
+        # Conexiones
+        aristas_1_2 = aristas[aristas['capa'] == '1_2']
+        dot.aristas(aristas_1_2['origen'], aristas_1_2['destino'])
+        aristas_2_grado = aristas[aristas['capa'] == '2_grado']
+        dot.aristas(aristas_2_grado['origen'], aristas_2_grado['destino'],
+                    color=aristas_2_grado['color'], penwidth=aristas_2_grado['penwidth'])
+
+
+def huella_diagrama(nodos, aristas, titulo):
+    """Hash del contenido del diagrama (tablas de nodos y aristas y título), para la caché en disco."""
+    h = hashlib.sha256(titulo.encode('utf-8'))
+    for tabla in (nodos, aristas):
+        h.update(pd.util.hash_pandas_object(tabla, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def _dibujar_diagrama(df_data, output_filename, global_mode=False, max_grados_por_asignatura=None, ver=True, cache=None):
+    nodos, aristas = tablas_diagrama(df_data, global_mode, max_grados_por_asignatura)
+    if global_mode:
+        titulo = 'Ruta Académica Global'
     else:
-        dot.attr('graph', label='Ruta Académica Global', labelloc='t', fontsize='40', size="40,60", dpi="300")
-
-    # 4. Construir Capas
-    # Capa 1: 1º Bachillerato
-    with dot.subgraph(name='cluster_1') as c:
-        c.attr(label='1º Bachillerato', style='filled', color='#F5F5F5')
-        c.attr('node', shape='box', style='filled,rounded', color='#E8E8E8')
-        nodos_1 = list(relaciones_1_a_2.keys())
-        for nodo in nodos_1: c.node(nodo, nodo.replace('_', ' '))
-
-    # Capa 2: 2º Bachillerato
-    with dot.subgraph(name='cluster_2') as c:
-        c.attr(label='2º Bachillerato (Asignaturas que ponderan)', style='filled', color='#E0E0E0')
-        c.attr('node', shape='box', style='filled,rounded')
-        for nodo in asignaturas_2_utiles:
-            c.node(nodo, nodo.replace('_', ' '), color=color_asignatura[nodo] + '80') # Color con transparencia
-
-    # Capa 4: Grados Universitarios (Agrupados por Rama)
-    with dot.subgraph(name='cluster_4') as c:
-        c.attr(label='Grados Universitarios', style='filled', color='#D0D0D0')
-        c.attr('node', shape='box', style='filled,rounded')
-        for rama in sorted(df_data['Rama_de_conocimiento'].unique()):
-            with c.subgraph(name=f'cluster_rama_{rama.replace(" ", "")}') as sub_c:
-                sub_c.attr(label=rama, style='filled', color='#C8C8C8')
-                grados_en_rama = df_data[df_data['Rama_de_conocimiento'] == rama]['Grado']
-                for grado in grados_en_rama:
-                    label_grado = grado.replace(' + ', '+\n').replace(' y ', ' y\n').replace(' de ', ' de\n')
-                    sub_c.node(grado, label_grado, color='#FFDAB9') # Color melocotón para los grados
-
-    # 5. Crear Conexiones
-    # 1º Bach -> 2º Bach
-    for precursor, sucesores in relaciones_1_a_2.items():
-        for sucesor in sucesores:
-            if sucesor in asignaturas_2_utiles: dot.edge(precursor, sucesor)
-
-    # 2º Bach -> Grados
-    for asignatura in asignaturas_2_utiles:
-        # Ponderación mínima para dibujar una línea
-        min_pond = 0.2 if global_mode else 0.1
-        
-        grados_conectados = df_data[df_data[asignatura] >= min_pond]
-        
-        # Limitar en modo global
-        if global_mode and max_grados_por_asignatura and len(grados_conectados) > max_grados_por_asignatura:
-            grados_conectados = grados_conectados.nlargest(max_grados_por_asignatura, asignatura)
-
-        for _, row in grados_conectados.iterrows():
-            grado = row['Grado']
-            ponderacion = row[asignatura]
-            penwidth = '2.5' if ponderacion == 0.2 else '1.0'
-            dot.edge(asignatura, grado, color=color_asignatura[asignatura], penwidth=penwidth)
-
-    # 6. Renderizar
-    print(f"Generando diagrama... se guardará como '{output_filename}.png'")
-    dot.render(output_filename, format='png', view=True)
+        titulo = f'Ruta Académica para: {df_data["Rama_de_conocimiento"].iloc[0].split("+")[0]}'
+    ruta_png = f'{output_filename}.png'
+
+    # Con caché en disco, un diagrama ya renderizado (mismas tablas, mismo código) se escribe sin llamar a Graphviz
+    if cache is not None:
+        version = huella_diagrama(nodos, aristas, titulo)
+        parametros = {'global_mode': global_mode, 'formato': 'png', 'codigo': huella_codigo(sys.modules[__name__], escritor_dot)}
+        png = cache.obtener('diagrama_dot', version, parametros)
+        if png is not None:
+            with open(ruta_png, 'wb') as f:
+                f.write(png)
+            print(f"Diagrama '{ruta_png}' escrito desde la caché.")
+            if ver:
+                webbrowser.open(pathlib.Path(ruta_png).resolve().as_uri())
+            return
+
+    # Renderizar: el DOT va en flujo a la entrada de `dot`; sin Graphviz, se guarda el .gv
+    if not dot_disponible():
+        ruta_dot = f'{output_filename}.gv'
+        with open(ruta_dot, 'w', encoding='utf-8') as f:
+            escribir_diagrama(f, nodos, aristas, titulo, global_mode)
+        print(f"Aviso: no se encontró Graphviz ('dot'); se ha guardado el diagrama en '{ruta_dot}'. "
+              f"Renderízalo con: dot -Tpng {ruta_dot} -o {output_filename}.png")
+        return
+    print(f"Generando diagrama... se guardará como '{ruta_png}'")
+    with renderizar(ruta_png, formato='png') as entrada_dot:
+        escribir_diagrama(entrada_dot, nodos, aristas, titulo, global_mode)
+    if cache is not None:
+        cache.guardar('diagrama_dot', version, parametros, pathlib.Path(ruta_png).read_bytes())
     print("¡Diagrama generado con éxito!")
+    if ver:
+        webbrowser.open(pathlib.Path(ruta_png).resolve().as_uri())
 
 # --- SCRIPT PRINCIPAL ---
 if __name__ == "__main__":
     df_ponderaciones = cargar_y_limpiar_csv('ponderaciones_andalucia.csv')
+    cache = CacheDisco()
     
     if df_ponderaciones is not None:
         
         # --- OPCIÓN 1: Generar un gráfico para una RAMA ESPECÍFICA ---
         # Descomenta la línea que te interese
         
-        # crear_diagrama_filtrado(df_ponderaciones, rama_filter='IyA')
-        # crear_diagrama_filtrado(df_ponderaciones, rama_filter='SD')
-        # crear_diagrama_filtrado(df_ponderaciones, rama_filter='SyJ')
-        # crear_diagrama_filtrado(df_ponderaciones, rama_filter='C')
-        # crear_diagrama_filtrado(df_ponderaciones, rama_filter='AyH')
+        # crear_diagrama_filtrado(df_ponderaciones, cache=cache, rama_filter='IyA')
+        # crear_diagrama_filtrado(df_ponderaciones, cache=cache, rama_filter='SD')
+        # crear_diagrama_filtrado(df_ponderaciones, cache=cache, rama_filter='SyJ')
+        # crear_diagrama_filtrado(df_ponderaciones, cache=cache, rama_filter='C')
+        # crear_diagrama_filtrado(df_ponderaciones, cache=cache, rama_filter='AyH')
 
         # --- OPCIÓN 2: Generar el gráfico GLOBAL ---
         # Descomenta la siguiente línea para crear el gráfico con todas las conexiones.
         # ¡CUIDADO! Puede ser muy lento y generar un archivo muy grande.
         
-        crear_diagrama_global(df_ponderaciones)
\ No newline at end of file
+        crear_diagrama_global(df_ponderaciones, cache=cache)
\ No newline at end of file
@@ -2,45 +2,33 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import io
+import sys
+import hashlib
+
+from analitica import CuboUtilidad
+from cache_disco import CacheDisco, huella_codigo
+from ingesta import leer_ponderaciones
 
 # --- FUNCIÓN PARA CARGAR Y LIMPIAR EL CSV ---
 def cargar_y_limpiar_csv(filepath):
     """
     Carga el archivo CSV, lo limpia y prepara para el análisis.
     """
-    # Leer el archivo, saltando las filas finales que no son datos de grados.
+    # La ingesta separa la leyenda y las filas de pie (resúmenes, licencia) de los datos,
+    # interpreta la coma decimal y valida ramas y ponderaciones.
     try:
-        # Usamos 'latin1' encoding que suele ser más robusto con CSVs de origen español.
-        df = pd.read_csv(filepath, encoding='utf-8', on_bad_lines='skip')
+        resultado = leer_ponderaciones(filepath)
     except FileNotFoundError:
         print(f"Error: No se encontró el archivo '{filepath}'.")
         print("Asegúrate de que el archivo CSV esté en el mismo directorio que el script.")
         return None
+    except ValueError as e:
+        print(f"Error al cargar el CSV: {e}")
+        return None
 
-    # Limpiar el nombre de la primera columna que contiene texto extra
-    df.rename(columns={df.columns[0]: 'Grado'}, inplace=True)
-
-    # Eliminar filas que no son grados (resúmenes, notas al pie, etc.)
-    # Identificamos estas filas porque suelen tener valores nulos en 'Rama de conocimiento'
-    df = df.dropna(subset=['Rama de conocimiento'])
-    # También eliminamos filas de resumen que puedan haberse colado
-    df = df[~df['Grado'].str.contains("Pondera|No pondera|This work", case=False, na=False)]
-
-    # Limpiar y estandarizar los nombres de las columnas (asignaturas)
-    # Quitando espacios, acentos y caracteres especiales para facilitar el manejo.
-    nuevas_columnas = {col: col.strip().replace(' ', '_').replace('-', '_') for col in df.columns}
-    df.rename(columns=nuevas_columnas, inplace=True)
-    
-    # Iterar por las columnas de asignaturas para convertir los valores
-    for col in df.columns[2:]: # Empezamos desde la tercera columna (después de Grado y Rama)
-        # Reemplazar la coma decimal por un punto
-        if df[col].dtype == 'object':
-            df[col] = df[col].str.replace(',', '.', regex=False)
-        # Convertir a número, los errores (celdas vacías) se convertirán en NaN
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    # Rellenar los valores NaN (celdas vacías) con 0.0
-    df.fillna(0.0, inplace=True)
+    for incidencia in resultado.incidencias:
+        print(f"Aviso: fila {incidencia.fila} descartada: {incidencia.motivo}")
+    df = resultado.df
     
     # Mapeo de códigos de Rama a nombres completos
     ramas_map = {
@@ -65,23 +53,25 @@ def cargar_y_limpiar_csv(filepath):
     return df
 
 # --- FUNCIÓN PARA ANALIZAR Y VISUALIZAR ---
-def analizar_y_visualizar_por_rama(df):
+def huella_tabla(tabla):
+    """Hash del contenido de una tabla (valores e índice), para usarla como clave de caché."""
+    return hashlib.sha256(pd.util.hash_pandas_object(tabla).to_numpy().tobytes()).hexdigest()[:16]
+
+def analizar_y_visualizar_por_rama(df, cache=None, mostrar=True):
     """
     Analiza la utilidad de las asignaturas por rama y crea un gráfico para cada una.
+    Con `cache` (CacheDisco) el PNG de cada rama se guarda en disco, con la tabla
+    que dibuja como clave: si ya se generó con los mismos datos, se escribe sin
+    volver a dibujarlo (y no se muestra).
     """
     if df is None:
         return
+    codigo = huella_codigo(sys.modules[__name__])
 
-    # Convertir a formato largo para facilitar la agrupación
+    # Cubo rama x asignatura x nivel: se construye una vez y cada rama es un corte del cubo
     id_vars = ['Grado', 'Rama_Principal']
     value_vars = [col for col in df.columns if col not in id_vars and col not in ['Rama_de_conocimiento']]
-    df_long = df.melt(id_vars=id_vars, value_vars=value_vars, var_name='Asignatura', value_name='Ponderacion')
-
-    # Filtramos solo las ponderaciones que consideramos "útiles" (0.2) y "ligeramente útiles" (0.15)
-    df_util = df_long[df_long['Ponderacion'] >= 0.15].copy()
-
-    # Contamos cuántos grados en cada rama consideran útil cada asignatura
-    utilidad_por_rama = df_util.groupby(['Rama_Principal', 'Asignatura']).size().reset_index(name='Num_Grados_Utiles')
+    cubo = CuboUtilidad(df, columna_rama='Rama_Principal', asignaturas=value_vars)
 
     # Definimos las 5 ramas principales
     ramas_principales = [
@@ -92,16 +82,22 @@ def analizar_y_visualizar_por_rama(df):
     for rama in ramas_principales:
         print(f"\n--- Procesando Rama: {rama} ---")
         
-        # Filtrar datos para la rama actual
-        resultado_rama = utilidad_por_rama[utilidad_por_rama['Rama_Principal'] == rama]
+        # Contamos cuántos grados de la rama consideran útil (>= 0.15) cada asignatura y tomamos el Top 10
+        top_10_asignaturas = cubo.consultar(umbral=0.15, rama=rama, top_n=10)
         
-        if resultado_rama.empty:
+        if top_10_asignaturas.empty:
             print(f"No se encontraron asignaturas con ponderación >= 0.15 para la rama {rama}.")
             continue
 
-        # Ordenar y tomar el Top 10
-        top_10_asignaturas = resultado_rama.sort_values(by='Num_Grados_Utiles', ascending=False).head(10)
-        
+        nombre_archivo = f"top_asignaturas_{rama.replace(' ', '_').lower()}.png"
+        version = huella_tabla(top_10_asignaturas)
+        png = cache.obtener('grafico_barras', version, {'rama': rama, 'codigo': codigo}) if cache is not None else None
+        if png is not None:
+            with open(nombre_archivo, 'wb') as f:
+                f.write(png)
+            print(f"Gráfico guardado como: {nombre_archivo} (desde la caché)")
+            continue
+
         # Crear la visualización
         plt.figure(figsize=(12, 8))
         sns.barplot(
@@ -120,11 +116,17 @@ def analizar_y_visualizar_por_rama(df):
         for index, value in enumerate(top_10_asignaturas['Num_Grados_Utiles']):
             plt.text(value, index, f' {value}', va='center')
             
-        # Guardar el gráfico
-        nombre_archivo = f"top_asignaturas_{rama.replace(' ', '_').lower()}.png"
-        plt.savefig(nombre_archivo)
+        # Guardar el gráfico (los mismos bytes van al archivo y a la caché)
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='png')
+        with open(nombre_archivo, 'wb') as f:
+            f.write(buffer.getvalue())
+        if cache is not None:
+            cache.guardar('grafico_barras', version, {'rama': rama, 'codigo': codigo}, buffer.getvalue())
         print(f"Gráfico guardado como: {nombre_archivo}")
-        plt.show()
+        if mostrar:
+            plt.show()
+        plt.close()
 
 # --- SCRIPT PRINCIPAL ---
 if __name__ == "__main__":
@@ -133,4 +135,4 @@ if __name__ == "__main__":
     
     if df_ponderaciones is not None:
         print("\n--- Datos cargados y limpios. Iniciando análisis por rama. ---")
-        analizar_y_visualizar_por_rama(df_ponderaciones)
\ No newline at end of file
+        analizar_y_visualizar_por_rama(df_ponderaciones, cache=CacheDisco())
\ No newline at end of file
@@ -0,0 +1,539 @@
+import io
+import json
+import os
+import tempfile
+
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+import networkx as nx
+import numpy as np
+import pandas as pd
+from pyvis.network import Network as PyvisNetwork
+
+from compacto import agrupar_filas
+from escritor_dot import EscritorDot, renderizar
+
+# --- Grafo interactivo 1º Bach -> 2º Bach -> Grados (sin dependencia de Streamlit) ---
+
+# Definición de Relaciones 1º -> 2º Bachillerato
+RELACIONES_1_A_2 = {
+    'Matemáticas_I': ['Matemáticas_II'],
+    'Mates_Aplicadas_CCSS_I': ['Matemáticas_Aplicadas_CC.SS.'],
+    'Física_y_Química': ['Física', 'Química'],
+    'Biología_y_Geología': ['Biología', 'Geología_y_Ciencias_Ambientales'],
+    'Dibujo_Técnico_I': ['Dibujo_Técnico_II', 'Dibujo_Técnico_aplicado_a_las_artes_plásticas_y_al_diseño_II'],
+    'Latín_I': ['Latín_II'],
+    'Griego_I': ['Griego_II'],
+    'Economía': ['Empresa_y_Diseño_de_modelos_de_negocio'],
+    'Hª_Mundo_Contemporáneo': ['Historia_de_la_Filosofía', 'Historia_del_Arte', 'Geografía']
+}
+
+# Presupuesto de render: coste estimado = nodos + aristas (cada arista curva con
+# flecha, discontinua y con tooltip cuesta en el navegador tanto como un nodo).
+# Por encima, el grafo se simplifica (ver simplificar_grafo). Con los datos
+# actuales lo superan las ramas grandes (AyH, IyA, SyJ) con la ponderación 0.1.
+PRESUPUESTO_RENDER = 600
+# Formatos de exportación estática (DOT sin renderizar no necesita Graphviz)
+FORMATOS_IMAGEN = {'svg': 'image/svg+xml', 'png': 'image/png', 'dot': 'text/vnd.graphviz'}
+AVISO_SIMPLIFICADO = ("Gráfico simplificado para que siga siendo fluido ({aristas} conexiones): "
+                      "líneas rectas sin flechas; las ponderaciones menores de 0.2 se ven más claras "
+                      "y el valor aparece al pasar el ratón.")
+
+
+def agrupar_grados_por_perfil(df_data, minimo=0.0):
+    """
+    Une en una fila los grados con las mismas ponderaciones visibles (las >=
+    `minimo`) en las columnas de `df_data`. Devuelve (df, miembros): cada perfil
+    conserva la fila de su primer grado en orden alfabético y miembros[grado]
+    es la lista ordenada de los grados de ese perfil.
+    """
+    columnas = [c for c in df_data.columns if c not in ['Grado', 'Rama_de_conocimiento']]
+    df_data = df_data.drop_duplicates('Grado').sort_values('Grado', kind='stable')
+    pesos = df_data[columnas].to_numpy(dtype=np.float64)
+    primeras, perfil = agrupar_filas(np.where(pesos >= minimo, pesos, 0.0))
+    grados = df_data['Grado'].to_numpy(dtype=object)
+    listas = pd.Series(grados).groupby(perfil).agg(list)
+    miembros = {grados[i]: listas[k] for k, i in enumerate(primeras)}
+    return df_data.iloc[primeras], miembros
+
+
+def construir_grafo(df_data, mostrar_ponderacion_015=False, mostrar_ponderacion_01=False, selected_node_id=None, avisar=None, agrupar_perfiles=False):
+    """
+    Construye con NetworkX el grafo 1º Bach -> 2º Bach -> Grados, opcionalmente
+    filtrado por un nodo seleccionado. Con `agrupar_perfiles` los grados con las
+    mismas ponderaciones visibles forman un solo nodo con la lista de sus grados
+    (ver agrupar_grados_por_perfil), así que nodos y aristas crecen con los
+    perfiles distintos y no con los grados. `avisar` recibe los avisos para el
+    usuario (p. ej. st.warning en la app); sin él se ignoran.
+    """
+    
+    # Detectar si el nodo seleccionado tiene prefijo y extraer su tipo y nombre base
+    node_type = None
+    node_base_name = None
+    
+    if selected_node_id:
+        if selected_node_id.startswith("1bach_"):
+            node_type = "1bach"
+            node_base_name = selected_node_id[6:]  # Quitar "1bach_"
+        elif selected_node_id.startswith("2bach_"):
+            node_type = "2bach"
+            node_base_name = selected_node_id[6:]  # Quitar "2bach_"
+        elif selected_node_id.startswith("grado_"):
+            node_type = "grado"
+            node_base_name = selected_node_id[6:]  # Quitar "grado_"
+        else:
+            # Si no tiene prefijo, determinar el tipo por su contenido
+            if selected_node_id in RELACIONES_1_A_2:
+                node_type = "1bach"
+                node_base_name = selected_node_id
+            elif selected_node_id in df_data.columns and selected_node_id not in ['Grado', 'Rama_de_conocimiento']:
+                node_type = "2bach"
+                node_base_name = selected_node_id
+            elif selected_node_id in df_data['Grado'].unique():
+                node_type = "grado"
+                node_base_name = selected_node_id
+    
+    # Filtrar df_data según el tipo de nodo seleccionado
+    if node_type == "1bach" and node_base_name:
+        # Si el nodo seleccionado es una asignatura de 1º Bach
+        if node_base_name in RELACIONES_1_A_2:
+            # Mantener solo las asignaturas de 2º Bach relacionadas y los grados a los que estas conectan
+            sucesores_directos = RELACIONES_1_A_2[node_base_name]
+            df_data = df_data[df_data.apply(lambda row: any(row[s] > 0 for s in sucesores_directos if s in row), axis=1)]
+            # Y también filtrar las columnas de asignaturas de 2º Bach a solo las sucesoras
+            cols_a_mantener = ['Grado', 'Rama_de_conocimiento'] + [s for s in sucesores_directos if s in df_data.columns]
+            df_data = df_data[cols_a_mantener]
+    elif node_type == "2bach" and node_base_name:
+        # Si el nodo seleccionado es una asignatura de 2º Bach
+        if node_base_name in df_data.columns and node_base_name not in ['Grado', 'Rama_de_conocimiento']:
+            df_data = df_data[df_data[node_base_name] > 0] # Mantener solo grados donde esta asignatura pondera
+            # Mantener solo esta asignatura de 2º Bach y los grados
+            cols_a_mantener = ['Grado', 'Rama_de_conocimiento', node_base_name]
+            df_data = df_data[cols_a_mantener]
+    elif node_type == "grado" and node_base_name:
+        # Si el nodo seleccionado es un Grado
+        if node_base_name in df_data['Grado'].unique():
+            df_data = df_data[df_data['Grado'] == node_base_name] # Mantener solo este grado
+    
+    if df_data.empty and selected_node_id:
+        if avisar is not None:
+            avisar(f"No se encontraron datos relevantes para el nodo seleccionado: {selected_node_id}")
+        # For now, let it proceed, Pyvis will just show an empty graph or a very small one.
+
+
+    # Inicializar Pyvis Network
+    # Usamos un nombre de archivo temporal para el gráfico Pyvis
+    # pyvis_file = f"temp_graph_{rama_filter_display_name.replace(' ','_')}.html"
+    # nt = PyvisNetwork(height=f"{alto_px}px", width="100%", notebook=True, directed=True, cdn_resources='remote') # Usar 100% para ancho responsivo
+    
+    # Para evitar problemas con `notebook=True` en Streamlit y asegurar que se pueda guardar:
+    # Guardamos el HTML y lo leemos para st.components.v1.html
+    # Es crucial que el path sea accesible por el servidor de Streamlit.
+    # Usar un nombre de archivo único si se generan muchos gráficos dinámicamente para evitar colisiones,
+    # o limpiar después. Para este caso, un nombre fijo por rama podría ser suficiente si se actualiza.
+    
+    # Simplificación: Usar NetworkX para construir y luego convertir a DOT para st.graphviz_chart
+    # ya que la interactividad de clic directa con Pyvis en Streamlit es compleja de implementar
+    # para el filtrado dinámico sin componentes personalizados.
+    # Si la interactividad de arrastrar/zoom es lo principal, Pyvis es bueno, pero el clic para filtrar es el desafío.
+
+    # Re-enfocando en NetworkX + Graphviz para Streamlit por simplicidad de "clic" (usando st.experimental_rerun o callbacks)
+    # O, para Pyvis, el "clic" sería más bien una guía visual y el usuario usaría selectores externos.
+
+    # --- Construcción del Grafo con NetworkX (lógica similar a la anterior de Graphviz) ---
+    G = nx.DiGraph()
+
+    # Columnas de ponderación (asignaturas de 2º Bach)
+    columnas_ponderacion = [col for col in df_data.columns if col not in ['Grado', 'Rama_de_conocimiento']]
+    
+    asignaturas_2_activas = [col for col in columnas_ponderacion if df_data[col].sum() > 0 or col == selected_node_id]
+    if not asignaturas_2_activas and selected_node_id and selected_node_id in columnas_ponderacion:
+         asignaturas_2_activas = [selected_node_id] # Asegurar que el nodo seleccionado se incluya si es de 2º Bach
+    elif not asignaturas_2_activas:
+        asignaturas_2_activas = columnas_ponderacion # Fallback si no hay sum > 0
+
+    asignaturas_1_bach_filtradas = []
+    if not selected_node_id or (selected_node_id and selected_node_id in RELACIONES_1_A_2): # Mostrar 1º Bach si no hay filtro o el filtro es de 1º
+        for precursor, sucesores in RELACIONES_1_A_2.items(): # Usar la variable global
+            if any(sucesor in asignaturas_2_activas for sucesor in sucesores):
+                asignaturas_1_bach_filtradas.append(precursor)
+    elif selected_node_id and any(selected_node_id in v for v in RELACIONES_1_A_2.values()): # Si el seleccionado es de 2º, mostrar sus precursores
+        for k,v in RELACIONES_1_A_2.items(): # Usar la variable global
+            if selected_node_id in v:
+                asignaturas_1_bach_filtradas.append(k)
+    # Añadir nodos con atributos optimizados para layout jerárquico (Sugiyama framework)
+    # Capa 1: 1º Bachillerato (nivel 0)
+    for i, nodo_1 in enumerate(sorted(asignaturas_1_bach_filtradas)):
+        node_id = f"1bach_{nodo_1}"  # Prefijo para nodos de 1º Bach
+        G.add_node(
+            node_id, 
+            level=0,  # Explicit level for hierarchical layout
+            layer=1, 
+            color='#E6E6FA', 
+            title=nodo_1.replace('_', ' '), 
+            shape='box', 
+            type='1_bach',
+            x=None,  # Let hierarchical layout determine position
+            y=i * 100,  # Vertical spacing hint
+            fixed=False,
+            physics=False
+        )
+
+    # Capa 2: 2º Bachillerato (nivel 1)
+    if asignaturas_2_activas:
+        cmap = plt.cm.get_cmap('tab20', len(asignaturas_2_activas))
+        color_map_2_bach = {asig: mcolors.to_hex(cmap(i)) for i, asig in enumerate(asignaturas_2_activas)}
+    
+    for i, nodo_2 in enumerate(sorted(asignaturas_2_activas)):
+        node_id = f"2bach_{nodo_2}"  # Prefijo para nodos de 2º Bach
+        # Colorear en rojo si es la asignatura seleccionada
+        # Ajustamos la comprobación para manejar el nodo seleccionado con o sin prefijo
+        is_selected_asignatura = selected_node_id and (nodo_2 == selected_node_id or f"2bach_{nodo_2}" == selected_node_id)
+        
+        if is_selected_asignatura:
+            color = '#FF0000'  # Rojo para asignatura seleccionada
+        else:
+            color = color_map_2_bach.get(nodo_2, '#D3D3D3')
+        G.add_node(
+            node_id, 
+            level=1,  # Explicit level for hierarchical layout
+            layer=2, 
+            color=color + 'BF', 
+            title=nodo_2.replace('_', ' '), 
+            shape='box', 
+            type='2_bach',
+            x=None,  # Let hierarchical layout determine position
+            y=i * 80,  # Vertical spacing hint
+            fixed=False,
+            physics=False
+        )
+
+    min_ponderacion_mostrar = 0.19 # Por defecto, solo muestra ponderación 0.2
+    if mostrar_ponderacion_01:
+        min_ponderacion_mostrar = 0.01 # Muestra todas las ponderaciones mayores que 0
+    elif mostrar_ponderacion_015:  # Mantenemos para compatibilidad, pero efectivamente se ignora
+        min_ponderacion_mostrar = 0.19 # Sigue mostrando solo 0.2
+
+    # Un nodo por perfil de ponderación: el primer grado da nombre al nodo y el resto va en la lista
+    miembros_perfil = {}
+    if agrupar_perfiles and not df_data.empty:
+        df_data, miembros_perfil = agrupar_grados_por_perfil(df_data, min_ponderacion_mostrar)
+
+    # Capa 3: Grados Universitarios (nivel 2)
+    grados_en_df = sorted(df_data['Grado'].unique())
+    for i, grado_uni in enumerate(grados_en_df):
+        node_id = f"grado_{grado_uni}"  # Prefijo para nodos de grado
+        miembros = miembros_perfil.get(grado_uni, [grado_uni])
+        extra = {}
+        if len(miembros) > 1:
+            extra = {'miembros': miembros, 'label': f"{node_id} (+{len(miembros) - 1})"}
+        G.add_node(
+            node_id, 
+            level=2,  # Explicit level for hierarchical layout
+            layer=3, 
+            color='#FFDAB9', 
+            title='\n'.join(miembros), 
+            shape='box', 
+            type='grado',
+            x=None,  # Let hierarchical layout determine position
+            y=i * 60,  # Vertical spacing hint, more compact for many nodes
+            fixed=False,
+            physics=False,
+            **extra
+        )    # Conexiones 1º Bach -> 2º Bach (optimizadas para layout jerárquico)
+    for precursor, sucesores in RELACIONES_1_A_2.items(): # Usar la variable global
+        node_1_id = f"1bach_{precursor}"
+        if node_1_id in G: # Si el nodo de 1º Bach está en el grafo
+            for sucesor in sucesores:
+                node_2_id = f"2bach_{sucesor}"
+                if node_2_id in G: # Si el nodo de 2º Bach está en el grafo
+                    G.add_edge(
+                        node_1_id, 
+                        node_2_id, 
+                        color='#6A5ACD', 
+                        weight=2,
+                        width=2,
+                        arrows={'to': {'enabled': True, 'scaleFactor': 0.8}},
+                        smooth={'type': 'straightCross', 'forceDirection': 'horizontal'},
+                        physics=False
+                    )    # Conexiones 2º Bach -> Grados (optimizadas para minimizar cruces)
+
+    # Agrupar conexiones por asignatura para mejor organización
+    for asignatura_2 in sorted(asignaturas_2_activas):
+        node_2_id = f"2bach_{asignatura_2}"
+        if node_2_id not in G: continue # Si la asignatura no está en el grafo (p.ej. por filtrado de nodo)
+        color_base_edge = color_map_2_bach.get(asignatura_2, '#808080')
+        
+        # Recopilar grados que van a conectar para ordenarlos
+        grados_a_conectar = []
+        for _, row in df_data.iterrows():
+            grado = row['Grado']
+            grado_id = f"grado_{grado}"
+            if grado_id not in G: continue # Si el grado no está en el grafo
+            
+            ponderacion = row.get(asignatura_2, 0.0)
+            if ponderacion >= min_ponderacion_mostrar:
+                grados_a_conectar.append((grado, grado_id, ponderacion))
+          # Ordenar grados por ponderación (mayor primero) para minimizar cruces
+        grados_a_conectar.sort(key=lambda x: x[2], reverse=True)
+        
+        # Crear conexiones ordenadas
+        for grado, grado_id, ponderacion in grados_a_conectar:
+            edge_color = color_base_edge
+            
+            # Determinar estilo de línea y grosor basado en ponderación
+            dashes = False # Default to solid
+
+            if ponderacion >= 0.2:
+                edge_width = 2.5
+                # dashes remains False
+            elif ponderacion >= 0.1 and ponderacion < 0.2:  # Covers 0.1 to 0.19
+                edge_width = 1.5 # Consistent width for all dashed lines in this range
+                dashes = [5, 5]
+            else: # For ponderaciones < 0.1, if they are shown (e.g. 0.09)
+                edge_width = 1.0 # Thinner solid line for these
+                dashes = False # Not dashed as per specific request
+            
+            edge_title = f"{ponderacion:.2f}"
+            
+            edge_properties = {
+                'color': edge_color, 
+                'weight': edge_width, 
+                'width': edge_width,
+                'title': edge_title, 
+                'arrows': {'to': {'enabled': True, 'scaleFactor': 0.8}},
+                'smooth': {'type': 'straightCross', 'forceDirection': 'horizontal'},
+                'physics': False
+            }
+            
+            # Agregar propiedades de línea discontinua si es necesario
+            if dashes:
+                edge_properties['dashes'] = dashes
+            
+            G.add_edge(node_2_id, grado_id, **edge_properties)
+
+    return G
+
+
+def coste_render(G):
+    """Coste estimado de dibujar el grafo en el navegador."""
+    return G.number_of_nodes() + G.number_of_edges()
+
+
+def simplificar_grafo(G):
+    """
+    Deja en cada arista solo color, grosor y tooltip, para que hereden el estilo
+    común de las opciones (rectas y sin flechas) en lugar de llevar cada una el
+    suyo. Las ponderaciones menores de 0.2 pasan de discontinuas a un color más
+    claro. Modifica G y lo marca con G.graph['simplificado'] = True.
+    """
+    for a, b, datos in G.edges(data=True):
+        color = datos.get('color', '#808080')
+        if datos.get('dashes'):
+            color += '66'  # discontinua -> semitransparente
+        estilo = {'color': color, 'width': datos.get('width', 1)}
+        if 'title' in datos:
+            estilo['title'] = datos['title']
+        datos.clear()
+        datos.update(estilo)
+    G.graph['simplificado'] = True
+    return G
+
+
+def grafo_a_json(G):
+    """Nodos y aristas del grafo como estructuras serializables (sin las pistas de posición de Pyvis)."""
+    ocultos = {'x', 'y', 'fixed', 'physics'}
+    nodos = [{'id': n, **{k: v for k, v in d.items() if k not in ocultos}} for n, d in G.nodes(data=True)]
+    aristas = [{'source': a, 'target': b, **{k: v for k, v in d.items() if k not in ocultos}} for a, b, d in G.edges(data=True)]
+    return {'nodes': nodos, 'edges': aristas}
+
+
+def escribir_dot(G, salida, titulo=None):
+    """
+    Escribe en DOT el grafo de construir_grafo, con sus tres capas de izquierda a
+    derecha y los mismos colores y grosores que la vista interactiva.
+    """
+    dot = EscritorDot(salida)
+    with dot.grafo('ponderaciones', comentario=titulo):
+        dot.atributos('graph', rankdir='LR', ranksep='2.5', nodesep='0.12', fontname='Arial', label=titulo, labelloc='t')
+        dot.atributos('node', shape='box', style='rounded,filled', fontname='Arial', fontsize='10', color='#999999')
+        dot.atributos('edge', arrowsize='0.6')
+        capas = {}
+        for nodo, nivel in G.nodes(data='level'):
+            capas.setdefault(nivel, []).append(nodo)
+        for nivel, nodos in sorted(capas.items()):
+            with dot.subgrafo(f'capa_{nivel}', rank='same'):
+                dot.nodos(nodos, label=[G.nodes[n]['title'] for n in nodos], fillcolor=[G.nodes[n]['color'] for n in nodos])
+        aristas = list(G.edges(data=True))
+        if aristas:
+            dot.aristas([o for o, _, _ in aristas], [d for _, d, _ in aristas],
+                        color=[a.get('color', '#808080') for _, _, a in aristas],
+                        penwidth=[a.get('width', 1) for _, _, a in aristas],
+                        style=['dashed' if a.get('dashes') else 'solid' for _, _, a in aristas],
+                        tooltip=[a.get('title', '') for _, _, a in aristas])
+
+
+def exportar_grafo(G, formato='svg', titulo=None):
+    """
+    Imagen estática (bytes) del grafo de construir_grafo, sin navegador: la
+    disposición la hace Graphviz ('dot'). Con formato 'dot' devuelve el DOT sin
+    renderizar. Lanza RuntimeError si hace falta Graphviz y no está instalado.
+    """
+    if formato not in FORMATOS_IMAGEN:
+        raise ValueError(f"Formato no soportado: {formato!r} (disponibles: {', '.join(FORMATOS_IMAGEN)}).")
+    if formato == 'dot':
+        texto = io.StringIO()
+        escribir_dot(G, texto, titulo)
+        return texto.getvalue().encode('utf-8')
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, f'grafo.{formato}')
+        with renderizar(ruta, formato) as entrada:
+            escribir_dot(G, entrada, titulo)
+        with open(ruta, 'rb') as f:
+            return f.read()
+
+
+def generar_diagrama_networkx_pyvis(df_data, rama_filter_display_name, mostrar_ponderacion_015=False, mostrar_ponderacion_01=False, alto_px=800, ancho_px=1000, selected_node_id=None, avisar=None, presupuesto_render=PRESUPUESTO_RENDER, comprobar_cancelacion=None, agrupar_perfiles=False):
+    """
+    Genera un diagrama interactivo usando NetworkX para la lógica y Pyvis para la visualización.
+    Permite filtrar por un nodo seleccionado (ver construir_grafo). Si el coste
+    estimado supera `presupuesto_render` (None para no limitarlo), el grafo se
+    simplifica y el HTML lo indica con un aviso. `comprobar_cancelacion` (sin
+    argumentos) se llama entre etapas y puede lanzar una excepción para abandonar
+    una generación que ya no se va a mostrar. `agrupar_perfiles` se pasa a
+    construir_grafo (un nodo por perfil de ponderación).
+    """
+    comprobar = comprobar_cancelacion or (lambda: None)
+    G = construir_grafo(df_data, mostrar_ponderacion_015, mostrar_ponderacion_01, selected_node_id, avisar, agrupar_perfiles)
+    comprobar()
+
+    # --- Visualización con Pyvis ---
+    if not G.nodes():
+        return None # Devuelve None si no hay nodos para evitar errores en Pyvis
+
+    simplificado = presupuesto_render is not None and coste_render(G) > presupuesto_render
+    if simplificado:
+        simplificar_grafo(G)
+
+    nt = PyvisNetwork(height=f"{alto_px}px", width="100%", notebook=False, directed=True, cdn_resources='remote')
+    nt.from_nx(G)
+    comprobar()
+
+    # Hierarchical layout configuration following Sugiyama framework principles
+    options_json = """
+    {
+      "physics": {
+        "enabled": false
+      },
+      "layout": {
+        "hierarchical": {
+          "enabled": true,
+          "direction": "LR",
+          "sortMethod": "directed",
+          "shakeTowards": "roots",
+          "levelSeparation": 1000,
+          "nodeSpacing": 120,
+          "treeSpacing": 200,
+          "blockShifting": true,
+          "edgeMinimization": true,
+          "parentCentralization": true,
+          "improvedLayout": true
+        }
+      },
+      "interaction": {
+        "dragNodes": false,
+        "dragView": true,
+        "zoomView": true,
+        "selectConnectedEdges": true,
+        "tooltipDelay": 200,
+        "hideEdgesOnDrag": false,
+        "hideNodesOnDrag": false
+      },
+      "nodes": {
+        "font": {
+          "size": 11,
+          "face": "arial",
+          "strokeWidth": 2,
+          "strokeColor": "#ffffff"
+        },
+        "borderWidth": 2,
+        "borderWidthSelected": 3,
+        "chosen": {
+          "node": {
+            "borderColor": "#2B7CE9",
+            "borderWidth": 3
+          }
+        },
+        "shape": "box",
+        "margin": 10,
+        "widthConstraint": {
+          "minimum": 80,
+          "maximum": 200
+        }
+      },
+      "edges": {
+        "font": {
+          "size": 9,
+          "align": "top",
+          "strokeWidth": 1,
+          "strokeColor": "#ffffff"
+        },
+        "arrows": {
+          "to": {
+            "enabled": true, 
+            "scaleFactor": 0.8,
+            "type": "arrow"
+          }
+        },
+        "smooth": {
+          "enabled": true,
+          "type": "cubicBezier",
+          "forceDirection": "horizontal",
+          "roundness": 0.7
+        },
+        "color": {
+          "inherit": false,
+          "opacity": 0.8
+        },
+        "width": 2,
+        "chosen": {
+          "edge": {
+            "color": "#2B7CE9",
+            "width": 3
+          }
+        }
+      }
+    }
+    """
+    if simplificado:
+        opciones = json.loads(options_json)
+        opciones['edges']['smooth'] = {'enabled': False}
+        opciones['edges']['arrows']['to']['enabled'] = False
+        opciones['edges']['chosen'] = False
+        opciones['interaction']['hideEdgesOnDrag'] = True
+        opciones['interaction']['hideEdgesOnZoom'] = True
+        options_json = json.dumps(opciones)
+    nt.set_options(options_json)
+    comprobar()
+    
+    # Guardar en un archivo HTML temporal y luego leerlo
+    # Esto es necesario porque st.components.v1.html no toma directamente el objeto nt.
+    # Asegúrate de que el directorio temporal es escribible por la app Streamlit.
+    # Podrías usar el módulo `tempfile` de Python para crear un archivo temporal de forma segura.
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp_file:
+        nt.save_graph(tmp_file.name)
+        html_path = tmp_file.name
+    
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    
+    os.unlink(html_path) # Eliminar el archivo temporal después de leerlo
+
+    if simplificado:
+        aviso = AVISO_SIMPLIFICADO.format(aristas=G.number_of_edges())
+        html_content = html_content.replace(
+            '<body>',
+            '<body>\n<div style="font-family: arial; font-size: 12px; color: #555; padding: 4px 8px;">'
+            f'{aviso}</div>', 1)
+
+    return html_content
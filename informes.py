@@ -0,0 +1,372 @@
+import argparse
+import csv
+import html
+import io
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+import compacto
+import datos
+import grafo
+import ingesta
+from cache_disco import CacheDisco, huella_codigo
+from calculadora import NOTA_MINIMA_ESPECIFICA, ranking_grados
+from datos import RAMAS_DESDOBLADAS, componentes_rama, version_dataset
+from exportar_estatico import escribir_si_cambia, nombre_asignatura, nombre_rama, pagina, slug
+from grafo import construir_grafo
+from ingesta import leer_ponderaciones, normalizar_nombre_columna
+
+# --- Informes personalizados por alumno, en lote ---
+#
+# Lee un archivo de cohorte (una fila por alumno) y escribe un informe HTML por
+# alumno con su ranking de notas de admisión, los grados que pondera cada una de
+# sus asignaturas y un diagrama de flujo enfocado en ellas (SVG incrustado, así
+# que el informe es un solo archivo y se puede imprimir a PDF desde el navegador).
+#
+# - Los informes se generan en un pool de procesos; cada proceso carga el dataset
+#   una vez (de la caché en disco, con la misma entrada que la app).
+# - Lo que no depende del alumno se reutiliza entre alumnos: el fragmento de grafo
+#   y la sección de cada asignatura se memorizan en cada proceso y el diagrama de
+#   cada combinación de asignaturas y rama se guarda en la caché en disco, que
+#   comparten todos los procesos y las ejecuciones siguientes.
+# - La cohorte se lee por bloques y solo hay unos pocos alumnos en vuelo por
+#   proceso; cada informe se escribe al terminar y el índice y el resumen CSV se
+#   van ampliando, así que la memoria no crece con el tamaño de la cohorte.
+#
+# Cohorte (CSV, separador y coma decimal detectados): Alumno, Nota_Bachillerato,
+# Nota_Fase_General, opcionalmente Rama (código o nombre) y una columna por
+# asignatura específica con el nombre del CSV de ponderaciones (p. ej.
+# Matemáticas_II o "Matemáticas II"); las celdas vacías son asignaturas no cursadas.
+
+DIRECTORIO_SALIDA = 'informes'
+COLUMNAS_COHORTE = ('Alumno', 'Nota_Bachillerato', 'Nota_Fase_General')
+COLUMNA_RAMA = 'Rama'
+TAM_BLOQUE_COHORTE = 64
+ALUMNOS_EN_VUELO_POR_PROCESO = 4
+GRADOS_RANKING = 25
+MAX_GRADOS_DIAGRAMA = 30
+NIVEL_DIAGRAMA = 0.2  # ponderación de las conexiones del diagrama (como el gráfico por defecto de la app)
+
+_estado = {}  # por proceso: dataset, versión, caché, salida
+_MARCA_FILAS = '<!-- filas -->'
+
+
+# --- Preparación de cada proceso ---
+
+def _iniciar_proceso(filepath, salida, directorio_cache):
+    plt.switch_backend('Agg')
+    plt.rcParams['svg.fonttype'] = 'none'  # texto como texto: SVG más ligero y seleccionable
+    cache = CacheDisco(directorio_cache)
+    version = version_dataset(filepath)
+
+    def leer():
+        resultado = leer_ponderaciones(filepath, compacto=True)
+        return resultado._replace(dataset=resultado.dataset.desdoblar_ramas(RAMAS_DESDOBLADAS))
+    parametros = {'desdobles': RAMAS_DESDOBLADAS, 'codigo': huella_codigo(ingesta, compacto, datos)}
+    dataset = cache.obtener_o_calcular('dataset', version, parametros, leer).dataset
+    # Códigos de rama de cada grado (un grado puede estar en varias filas y ramas)
+    ramas = {}
+    for grado, rama in zip(np.asarray(dataset.grados, dtype=object), np.asarray(dataset.ramas, dtype=object)):
+        ramas.setdefault(grado, set()).update(componentes_rama(rama))
+    _estado.update(dataset=dataset, version=version, cache=cache, salida=salida, ramas=ramas,
+                   codigos_rama=set().union(*ramas.values()))
+
+
+def _codigos_rama(grado):
+    return _estado['ramas'].get(grado, set())
+
+
+# --- Piezas compartidas entre alumnos (memorizadas por proceso) ---
+
+@lru_cache(maxsize=None)
+def fragmento_grafo(asignatura):
+    """Grafo 1º Bach -> asignatura -> grados en los que pondera NIVEL_DIAGRAMA (de construir_grafo)."""
+    dataset = _estado['dataset']
+    filas = np.flatnonzero(dataset.pesos(columnas=[asignatura])[:, 0] >= NIVEL_DIAGRAMA)
+    if not len(filas):
+        return nx.DiGraph()
+    return construir_grafo(dataset.a_dataframe(filas=filas, columnas=[asignatura]), selected_node_id=f"2bach_{asignatura}")
+
+
+@lru_cache(maxsize=None)
+def seccion_asignatura(asignatura, rama):
+    """HTML con los grados que pondera una asignatura: recuento por rama y, si hay rama del alumno, sus grados."""
+    dataset = _estado['dataset']
+    df = dataset.a_dataframe(filas=np.flatnonzero(dataset.pesos(columnas=[asignatura])[:, 0] > 0), columnas=[asignatura])
+    df = df.drop_duplicates('Grado').sort_values([asignatura, 'Grado'], ascending=[False, True])
+    recuento = df.groupby(asignatura)['Grado'].count().sort_index(ascending=False)
+    resumen = ', '.join(f"{n} con {p:g}" for p, n in recuento.items()) or "ninguno"
+    partes = [f'<h3>{html.escape(nombre_asignatura(asignatura))}</h3>',
+              f'<p>Pondera en {len(df)} grados ({resumen}).</p>']
+    if rama:
+        propios = df[[rama in _codigos_rama(g) for g in df['Grado']]]
+        if not propios.empty:
+            elementos = ''.join(f'<li>{html.escape(g)} ({p:g})</li>' for g, p in zip(propios['Grado'], propios[asignatura]))
+            partes.append(f'<details><summary>{len(propios)} de la rama {html.escape(nombre_rama(rama))}</summary>'
+                          f'<ul>{elementos}</ul></details>')
+    return '\n'.join(partes)
+
+
+def _grafo_alumno(asignaturas, rama):
+    """Unión de los fragmentos de las asignaturas, con los MAX_GRADOS_DIAGRAMA grados a los que llegan más de ellas."""
+    G = nx.compose_all([fragmento_grafo(a) for a in asignaturas]) if asignaturas else nx.DiGraph()
+    grados = [n for n, tipo in G.nodes(data='type') if tipo == 'grado' and G.in_degree(n) > 0
+              and (rama is None or rama in _codigos_rama(G.nodes[n]['title']))]
+    grados.sort(key=lambda n: (-G.in_degree(n), n))
+    resto = [n for n, tipo in G.nodes(data='type') if tipo != 'grado']
+    return G.subgraph(resto + grados[:MAX_GRADOS_DIAGRAMA]).copy(), len(grados)
+
+
+def _dibujar_svg(G):
+    """Diagrama por capas (1º Bach, 2º Bach, grados) con los colores de construir_grafo, como SVG."""
+    capas = {}
+    for nodo, nivel in G.nodes(data='level'):
+        capas.setdefault(nivel, []).append(nodo)
+    alto = max(len(nodos) for nodos in capas.values())
+    posiciones = {}
+    for nivel, nodos in capas.items():
+        nodos.sort(key=lambda n: G.nodes[n]['title'])
+        for i, nodo in enumerate(nodos):
+            posiciones[nodo] = (nivel, alto - (i + 0.5) * alto / len(nodos))
+
+    figura, ejes = plt.subplots(figsize=(13, max(3.0, 0.32 * alto)))
+    for origen, destino, color in G.edges(data='color'):
+        (x0, y0), (x1, y1) = posiciones[origen], posiciones[destino]
+        ejes.plot([x0, x1], [y0, y1], color=color, linewidth=1.2, alpha=0.7, zorder=1)
+    for nodo, (x, y) in posiciones.items():
+        datos_nodo = G.nodes[nodo]
+        ejes.text(x, y, datos_nodo['title'].replace('_', ' '), ha='center', va='center', fontsize=7, zorder=2,
+                  bbox={'boxstyle': 'round,pad=0.3', 'facecolor': datos_nodo['color'], 'edgecolor': '#999999'})
+    ejes.set_xlim(-0.5, 2.5)
+    ejes.set_ylim(0, alto)
+    ejes.axis('off')
+    figura.tight_layout()
+    buffer = io.StringIO()
+    figura.savefig(buffer, format='svg')
+    plt.close(figura)
+    return buffer.getvalue()
+
+
+def diagrama_alumno(asignaturas, rama):
+    """(svg, grados mostrados, grados totales) del diagrama de una combinación de asignaturas y rama (caché en disco)."""
+    parametros = {'asignaturas': sorted(asignaturas), 'rama': rama, 'max': MAX_GRADOS_DIAGRAMA,
+                  'codigo': huella_codigo(grafo, sys.modules[__name__])}
+
+    def dibujar():
+        G, total = _grafo_alumno(sorted(asignaturas), rama)
+        if not any(tipo == 'grado' for _, tipo in G.nodes(data='type')):
+            return None, 0, total
+        mostrados = sum(1 for _, tipo in G.nodes(data='type') if tipo == 'grado')
+        return _dibujar_svg(G), mostrados, total
+    return _estado['cache'].obtener_o_calcular('informe_diagrama', _estado['version'], parametros, dibujar)
+
+
+# --- Informe de un alumno (se ejecuta en los procesos del pool) ---
+
+def _numero(texto, columna, minimo=0.0, maximo=10.0):
+    try:
+        valor = float(str(texto).strip().replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"{columna}: '{texto}' no es un número.") from None
+    if not minimo <= valor <= maximo:
+        raise ValueError(f"{columna}: {valor:g} fuera de rango ({minimo:g}-{maximo:g}).")
+    return valor
+
+
+def leer_alumno(fila, asignaturas):
+    """(alumno, nota bachillerato, nota fase general, rama o None, notas por asignatura) de una fila de la cohorte."""
+    alumno = str(fila.get('Alumno') or '').strip()
+    if not alumno:
+        raise ValueError("Falta el nombre del alumno.")
+    bach = _numero(fila.get('Nota_Bachillerato'), 'Nota_Bachillerato')
+    fase = _numero(fila.get('Nota_Fase_General'), 'Nota_Fase_General')
+    rama = None
+    if str(fila.get(COLUMNA_RAMA) or '').strip():
+        componentes = componentes_rama(fila[COLUMNA_RAMA])
+        if len(componentes) != 1:
+            raise ValueError(f"Rama: '{fila[COLUMNA_RAMA]}' debe ser una sola rama.")
+        rama = componentes[0]
+        if rama not in _estado['codigos_rama']:
+            raise ValueError(f"Rama: '{str(fila[COLUMNA_RAMA]).strip()}' no es una rama conocida.")
+    notas = {a: _numero(fila[a], a) for a in asignaturas if str(fila.get(a) or '').strip()}
+    return alumno, bach, fase, rama, notas
+
+
+def _tabla_ranking(ranking):
+    filas = ''.join(
+        f'<tr><td class="num">{i}</td><td>{html.escape(g)}</td><td>{html.escape(r)}</td>'
+        f'<td class="num">{b:.3f}</td><td class="num">{e:.3f}</td><td class="num"><b>{n:.3f}</b></td></tr>'
+        for i, (g, r, b, e, n) in enumerate(ranking[['Grado', 'Rama_de_conocimiento', 'Nota_Base',
+                                                      'Nota_Especifica', 'Nota_Admision']].itertuples(index=False), 1))
+    return ('<table><thead><tr><th>#</th><th>Grado</th><th>Rama</th><th>Nota base</th><th>Específicas</th>'
+            f'<th>Nota de admisión</th></tr></thead><tbody>\n{filas}\n</tbody></table>')
+
+
+def generar_informe(tarea):
+    """
+    Escribe el informe de un alumno y devuelve su fila de resumen. Un alumno con
+    datos no válidos no detiene el lote: su fila lleva el error.
+    """
+    numero, fila = tarea
+    dataset = _estado['dataset']
+    try:
+        alumno, bach, fase, rama, notas = leer_alumno(fila, dataset.asignaturas)
+    except ValueError as e:
+        return {'Numero': numero, 'Alumno': fila.get('Alumno', ''), 'Archivo': '', 'Error': str(e)}
+
+    ranking = ranking_grados(dataset, bach, fase, notas)
+    if rama:
+        ranking = ranking[[rama in _codigos_rama(g) for g in ranking['Grado']]]
+    mejor = ranking.iloc[0] if len(ranking) else None
+
+    notas_html = ''.join(
+        f'<li>{html.escape(nombre_asignatura(a))}: {n:g}'
+        f'{"" if n >= NOTA_MINIMA_ESPECIFICA else " (no cuenta: nota menor de 5)"}</li>'
+        for a, n in sorted(notas.items()))
+    partes = [
+        f'<p>Nota de Bachillerato {bach:g} · Fase General {fase:g}'
+        f'{f" · Rama de interés: {html.escape(nombre_rama(rama))}" if rama else ""}</p>',
+        f'<ul>{notas_html or "<li>Sin asignaturas específicas.</li>"}</ul>',
+        f'<h2>Grados con mayor nota de admisión{" de su rama" if rama else ""}</h2>',
+        _tabla_ranking(ranking.head(GRADOS_RANKING)),
+        '<h2>Grados que pondera cada asignatura</h2>',
+    ]
+    partes += [seccion_asignatura(a, rama) for a in sorted(notas)] or ['<p>Sin asignaturas específicas.</p>']
+    partes.append('<h2>Diagrama de sus asignaturas</h2>')
+    svg, mostrados, total = diagrama_alumno(tuple(notas), rama)
+    if svg:
+        if mostrados < total:
+            partes.append(f'<p><small>Se muestran los {mostrados} grados (de {total}) a los que llegan más de sus '
+                          f'asignaturas con ponderación {NIVEL_DIAGRAMA:g}.</small></p>')
+        partes.append(svg[svg.index('<svg'):])
+    else:
+        partes.append(f'<p>Ninguna de sus asignaturas pondera {NIVEL_DIAGRAMA:g} en los grados seleccionados.</p>')
+    partes.append(f'<p><small>Versión de datos {_estado["version"]}.</small></p>')
+
+    archivo = f'{numero:04d}-{slug(alumno)}.html'
+    escribir_si_cambia(_estado['salida'], archivo, pagina(f"Informe de {alumno}", '\n'.join(partes)))
+    return {'Numero': numero, 'Alumno': alumno, 'Archivo': archivo,
+            'Mejor_Grado': mejor['Grado'] if mejor is not None else '',
+            'Nota_Admision': round(float(mejor['Nota_Admision']), 3) if mejor is not None else '', 'Error': ''}
+
+
+# --- Lote ---
+
+def leer_cohorte(ruta, asignaturas, tam_bloque=TAM_BLOQUE_COHORTE):
+    """
+    Genera (número, fila como dict de textos) de la cohorte por bloques. Lanza
+    ValueError si faltan columnas obligatorias; avisa de las columnas que no son
+    asignaturas conocidas (probablemente erratas), que se ignoran.
+    """
+    numero = 0
+    with pd.read_csv(ruta, sep=None, engine='python', dtype=str, keep_default_na=False,
+                     encoding='utf-8-sig', chunksize=tam_bloque) as lector:
+        for i, bloque in enumerate(lector):
+            bloque.columns = [normalizar_nombre_columna(c) for c in bloque.columns]
+            if i == 0:
+                faltan = [c for c in COLUMNAS_COHORTE if c not in bloque.columns]
+                if faltan:
+                    raise ValueError(f"Faltan columnas en la cohorte: {', '.join(faltan)}.")
+                ignoradas = [c for c in bloque.columns if c not in COLUMNAS_COHORTE + (COLUMNA_RAMA,) and c not in asignaturas]
+                if ignoradas:
+                    print(f"Aviso: columnas que no son asignaturas del CSV de ponderaciones (se ignoran): {', '.join(ignoradas)}")
+            for fila in bloque.to_dict('records'):
+                numero += 1
+                yield numero, fila
+
+
+def _abrir_indice(salida):
+    """Abre index.html con la cabecera de la tabla escrita; las filas se añaden según terminan los informes."""
+    indice = open(os.path.join(salida, 'index.html'), 'w', encoding='utf-8')
+    tabla = ('<table><thead><tr><th>#</th><th>Alumno</th><th>Mejor grado</th><th>Nota de admisión</th></tr></thead>'
+             '<tbody>\n')
+    inicio, _, fin = pagina("Informes por alumno", _MARCA_FILAS, volver=False).partition(_MARCA_FILAS)
+    indice.write(inicio + tabla)
+    return indice, '</tbody></table>' + fin
+
+
+def _fila_indice(resumen):
+    if resumen['Error']:
+        return (f'<tr><td class="num">{resumen["Numero"]}</td><td>{html.escape(str(resumen["Alumno"]))}</td>'
+                f'<td colspan="2">Error: {html.escape(resumen["Error"])}</td></tr>\n')
+    return (f'<tr><td class="num">{resumen["Numero"]}</td><td><a href="{html.escape(resumen["Archivo"])}">'
+            f'{html.escape(resumen["Alumno"])}</a></td><td>{html.escape(resumen["Mejor_Grado"])}</td>'
+            f'<td class="num">{resumen["Nota_Admision"]}</td></tr>\n')
+
+
+def generar_informes(cohorte, filepath='ponderaciones_andalucia.csv', salida=DIRECTORIO_SALIDA, procesos=None,
+                     directorio_cache=None):
+    """
+    Genera el informe de cada alumno de `cohorte` en `salida`, con index.html y
+    resumen.csv escritos a medida que terminan, en el orden de la cohorte: las
+    filas que terminan antes que las anteriores esperan en un búfer, que cuenta
+    para el límite de alumnos en vuelo. Devuelve (informes, errores).
+    """
+    os.makedirs(salida, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    directorio_cache = directorio_cache or CacheDisco().directorio
+    _iniciar_proceso(filepath, salida, directorio_cache)  # para validar la cohorte y dejar el dataset en la caché
+    asignaturas = _estado['dataset'].asignaturas
+
+    informes = errores = 0
+    indice, cierre_indice = _abrir_indice(salida)
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                             initargs=(filepath, salida, directorio_cache)) as ejecutor, \
+            indice, \
+            open(os.path.join(salida, 'resumen.csv'), 'w', newline='', encoding='utf-8') as archivo_resumen:
+        resumen_csv = csv.DictWriter(archivo_resumen, ['Numero', 'Alumno', 'Archivo', 'Mejor_Grado', 'Nota_Admision', 'Error'])
+        resumen_csv.writeheader()
+
+        pendientes = {}  # Numero -> fila de resumen terminada antes que alguna anterior
+        siguiente = 1
+
+        def recoger(terminados):
+            nonlocal informes, errores, siguiente
+            for futuro in terminados:
+                resumen = futuro.result()
+                pendientes[resumen['Numero']] = resumen
+            while siguiente in pendientes:
+                resumen = pendientes.pop(siguiente)
+                siguiente += 1
+                resumen_csv.writerow(resumen)
+                indice.write(_fila_indice(resumen))
+                if resumen['Error']:
+                    errores += 1
+                    print(f"Alumno {resumen['Numero']} ({resumen['Alumno']}): {resumen['Error']}")
+                else:
+                    informes += 1
+
+        en_vuelo = set()
+        for tarea in leer_cohorte(cohorte, asignaturas):
+            while len(en_vuelo) + len(pendientes) >= procesos * ALUMNOS_EN_VUELO_POR_PROCESO:
+                terminados, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                recoger(terminados)
+            en_vuelo.add(ejecutor.submit(generar_informe, tarea))
+        recoger(wait(en_vuelo).done)
+        indice.write(cierre_indice)
+    return informes, errores
+
+
+# --- SCRIPT PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un informe HTML personalizado por alumno a partir de un archivo de cohorte.")
+    parser.add_argument('cohorte', help="CSV con Alumno, Nota_Bachillerato, Nota_Fase_General, [Rama] y una columna por asignatura específica.")
+    parser.add_argument('--csv', default='ponderaciones_andalucia.csv')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA)
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos (por defecto, uno por CPU).")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        informes, errores = generar_informes(args.cohorte, args.csv, args.salida, args.procesos)
+    except (FileNotFoundError, ValueError) as e:
+        parser.exit(1, f"Error: {e}\n")
+    print(f"{informes} informes en '{args.salida}' ({errores} alumnos con errores) en {time.perf_counter() - inicio:.1f} s.")
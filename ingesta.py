@@ -0,0 +1,209 @@
+import csv
+import re
+import warnings
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from compacto import DatasetCompacto, codificar_ponderaciones
+from datos import RAMAS, NIVELES_PONDERACION, componentes_rama
+
+# --- Lectura única y validada del CSV de ponderaciones ---
+
+CODIFICACIONES = ('utf-8', 'latin1')
+TAM_BLOQUE = 5000
+
+_PATRON_FILA_SALTADA = re.compile(r"Skipping line (\d+): (.*)")
+
+
+class IncidenciaIngesta(NamedTuple):
+    """Fila del CSV que no se ha incorporado al dataset y por qué."""
+    fila: int  # número de registro de datos (sin contar la cabecera), empezando en 1
+    grado: Optional[str]
+    motivo: str
+
+
+class ResultadoIngesta(NamedTuple):
+    df: Optional[pd.DataFrame]  # None si se leyó en formato compacto
+    titulo_leyenda: str
+    leyenda: dict          # código de rama -> nombre, tal como viene en la cabecera
+    notas: list            # filas de pie (recuentos, licencia...) separadas de los datos
+    incidencias: list      # lista de IncidenciaIngesta
+    codificacion: str
+    dataset: Optional[DatasetCompacto] = None
+
+
+def normalizar_nombre_columna(columna):
+    return columna.strip().replace(' ', '_').replace('-', '_')
+
+
+def _parsear_leyenda(celda):
+    """
+    La primera celda de la cabecera contiene la leyenda de ramas y, en su última
+    línea, el nombre real de la columna ('Grados'). Devuelve (título, {código: nombre}).
+    """
+    lineas = [linea.strip() for linea in str(celda).splitlines() if linea.strip()]
+    if len(lineas) > 1:
+        lineas.pop()  # 'Grados'
+    else:
+        return "", {}
+    titulo = ""
+    if lineas[0].count(':') >= 2:
+        titulo, lineas[0] = (parte.strip() for parte in lineas[0].split(':', 1))
+    leyenda = {}
+    for linea in lineas:
+        codigo, separador, nombre = linea.partition(':')
+        if separador:
+            leyenda[codigo.strip()] = ' '.join(nombre.split())
+    return titulo, leyenda
+
+
+def _leer_cabecera(filepath, codificacion):
+    with open(filepath, encoding=codificacion, newline='') as f:
+        cabecera = next(csv.reader(f), None)
+    if not cabecera or len(cabecera) < 3:
+        raise ValueError("El CSV no tiene cabecera con columnas de grado, rama y asignaturas.")
+    return cabecera
+
+
+def _numerar_bloque(siguiente, n, saltados):
+    """
+    Números de registro de las `n` filas de un bloque: los siguientes a partir de
+    `siguiente` que el parser no descartó (`saltados`).
+    """
+    pendientes = sum(1 for registro in saltados if registro >= siguiente)
+    candidatos = np.arange(siguiente, siguiente + n + pendientes)
+    return candidatos[~np.isin(candidatos, list(saltados))][:n]
+
+
+def _validar_bloque(bloque, asignaturas, ramas_validas, numeros_fila, incidencias, notas):
+    """
+    Separa filas de pie, valida rama y ponderaciones y devuelve solo las filas
+    correctas. `numeros_fila` es el número de registro de cada fila del bloque.
+    """
+
+    # Filas de pie: sin código de rama. Las completamente vacías se ignoran sin más.
+    sin_rama = bloque['Rama_de_conocimiento'].isna().to_numpy()
+    for texto in bloque.loc[sin_rama, 'Grado'].dropna():
+        notas.append(texto)
+
+    validas = ~sin_rama
+    sin_grado = validas & bloque['Grado'].isna().to_numpy()
+    for fila in numeros_fila[sin_grado]:
+        incidencias.append(IncidenciaIngesta(int(fila), None, "Fila sin nombre de grado"))
+    validas &= ~sin_grado
+
+    ramas_unicas = bloque.loc[validas, 'Rama_de_conocimiento'].unique()
+    desconocidas = {r for r in ramas_unicas if not all(c in ramas_validas for c in componentes_rama(r))}
+    if desconocidas:
+        rama_mala = validas & bloque['Rama_de_conocimiento'].isin(desconocidas).to_numpy()
+        for fila, grado, rama in zip(numeros_fila[rama_mala], bloque.loc[rama_mala, 'Grado'], bloque.loc[rama_mala, 'Rama_de_conocimiento']):
+            incidencias.append(IncidenciaIngesta(int(fila), grado, f"Código de rama desconocido: {rama!r}"))
+        validas &= ~rama_mala
+
+    # Ponderaciones: el separador decimal ya se resolvió al parsear. Solo las columnas que
+    # el parser no pudo convertir (p. ej. un '0.1' con punto) pasan por la conversión lenta.
+    pesos = np.empty((len(bloque), len(asignaturas)), dtype=np.float64)
+    no_numericas = np.zeros((len(bloque), len(asignaturas)), dtype=bool)
+    for j, asig in enumerate(asignaturas):
+        columna = bloque[asig]
+        if columna.dtype == object:
+            convertida = pd.to_numeric(columna.str.replace(',', '.', regex=False), errors='coerce')
+            no_numericas[:, j] = (columna.notna() & convertida.isna()).to_numpy()
+            columna = convertida
+        pesos[:, j] = columna.to_numpy(dtype=np.float64, na_value=np.nan)
+    pesos = np.nan_to_num(pesos, nan=0.0)
+    permitidas = np.isclose(pesos[:, :, None], (0.0,) + NIVELES_PONDERACION).any(axis=2) & ~no_numericas
+    peso_malo = validas & ~permitidas.all(axis=1)
+    for i in np.flatnonzero(peso_malo):
+        columnas_malas = [asignaturas[j] for j in np.flatnonzero(~permitidas[i])]
+        valores = [bloque.iloc[i][c] for c in columnas_malas]
+        motivo = "Ponderación no válida en " + ", ".join(
+            f"{c}={v!r}" if isinstance(v, str) else f"{c}={v:g}" for c, v in zip(columnas_malas, valores))
+        incidencias.append(IncidenciaIngesta(int(numeros_fila[i]), bloque.iloc[i]['Grado'], motivo))
+    validas &= ~peso_malo
+
+    limpio = bloque.loc[validas, ['Grado', 'Rama_de_conocimiento']].copy()
+    limpio[asignaturas] = pesos[validas]
+    return limpio
+
+
+def _compactar_bloque(limpio, asignaturas):
+    return (limpio['Grado'].to_numpy(), limpio['Rama_de_conocimiento'].to_numpy(),
+            codificar_ponderaciones(limpio[asignaturas].to_numpy()))
+
+
+def _leer(filepath, codificacion, tam_bloque, compacto):
+    cabecera = _leer_cabecera(filepath, codificacion)
+    titulo_leyenda, leyenda = _parsear_leyenda(cabecera[0])
+    asignaturas = [normalizar_nombre_columna(c) for c in cabecera[2:]]
+    columnas = ['Grado', 'Rama_de_conocimiento'] + asignaturas
+    ramas_validas = set(RAMAS) | set(leyenda)
+
+    bloques, notas, incidencias = [], [], []
+    # Las filas se numeran por su registro en el archivo: las líneas vacías llegan
+    # como filas vacías (skip_blank_lines=False) y las mal formadas que descarta el
+    # parser, cuyo aviso llega al leer el bloque en que están, no ocupan fila.
+    saltados = set()
+    siguiente = 1
+    otros_avisos = []
+
+    def recoger_avisos(avisos):
+        for aviso in avisos:
+            if not issubclass(aviso.category, pd.errors.ParserWarning):
+                otros_avisos.append(aviso)
+                continue
+            # El parser numera registros contando la cabecera como el primero
+            for registro, detalle in _PATRON_FILA_SALTADA.findall(str(aviso.message)):
+                saltados.add(int(registro) - 1)
+                incidencias.append(IncidenciaIngesta(int(registro) - 1, None, f"Fila mal formada: {detalle.strip()}"))
+        avisos.clear()
+
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        lector = pd.read_csv(
+            filepath, encoding=codificacion, header=0, names=columnas,
+            dtype={'Grado': str, 'Rama_de_conocimiento': str},
+            decimal=',', engine='c', on_bad_lines='warn', skip_blank_lines=False, chunksize=tam_bloque,
+        )
+        with lector:
+            for bloque in lector:
+                recoger_avisos(avisos)
+                numeros_fila = _numerar_bloque(siguiente, len(bloque), saltados)
+                limpio = _validar_bloque(bloque, asignaturas, ramas_validas, numeros_fila, incidencias, notas)
+                # En modo compacto el bloque float64 se descarta nada más codificarlo
+                bloques.append(_compactar_bloque(limpio, asignaturas) if compacto else limpio)
+                if len(numeros_fila):
+                    siguiente = int(numeros_fila[-1]) + 1
+        recoger_avisos(avisos)
+
+    for aviso in otros_avisos:
+        warnings.warn_explicit(aviso.message, aviso.category, aviso.filename, aviso.lineno)
+
+    incidencias.sort(key=lambda inc: inc.fila)
+    if compacto:
+        dataset = DatasetCompacto.desde_bloques(bloques, asignaturas)
+        return ResultadoIngesta(None, titulo_leyenda, leyenda, notas, incidencias, codificacion, dataset)
+    df = pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(columns=columnas)
+    return ResultadoIngesta(df, titulo_leyenda, leyenda, notas, incidencias, codificacion)
+
+
+def leer_ponderaciones(filepath, codificaciones=CODIFICACIONES, tam_bloque=TAM_BLOQUE, compacto=False):
+    """
+    Lee y valida el CSV de ponderaciones por bloques.
+
+    La coma decimal se interpreta al parsear (parser C de pandas), la leyenda de
+    ramas se separa de la cabecera y las filas de pie de los datos, y cada fila
+    descartada queda registrada en `incidencias` en lugar de perderse en silencio.
+    Con `compacto=True` cada bloque se codifica al leerlo y el resultado llega
+    en `dataset` (DatasetCompacto) en lugar de `df`.
+    Lanza FileNotFoundError si no existe el archivo y ValueError si no tiene
+    una cabecera utilizable o ninguna codificación sirve.
+    """
+    for codificacion in codificaciones:
+        try:
+            return _leer(filepath, codificacion, tam_bloque, compacto)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"No se pudo decodificar '{filepath}' con ninguna de las codificaciones {codificaciones}.")
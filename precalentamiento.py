@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Precalentamiento de cachés en segundo plano ---
+
+
+class Precalentamiento:
+    """
+    Ejecuta tareas de precálculo en un pool de hilos sin bloquear a quien lo lanza.
+
+    Las tareas se agrupan en etapas: cada etapa es una lista de (nombre, función)
+    que se ejecutan en paralelo, y una etapa empieza cuando ha terminado la
+    anterior (p. ej. primero el dataset y después los índices y gráficos que lo
+    usan). Las funciones deben escribir en las mismas cachés que usa la app, de
+    modo que una petición que llega mientras tanto espera al cálculo en curso en
+    lugar de repetirlo. Un error en una tarea se registra y no detiene las demás.
+    """
+
+    def __init__(self, etapas, hilos=4):
+        self._etapas = [list(etapa) for etapa in etapas]
+        self._hilos = hilos
+        self._lock = threading.Lock()
+        self.total = sum(len(etapa) for etapa in self._etapas)
+        self.completadas = 0
+        self.en_curso = []
+        self.errores = []      # lista de (nombre, mensaje)
+        self.duraciones = {}   # nombre -> segundos
+        self.inicio = None
+        self.fin = None
+        self._hilo = None
+
+    def iniciar(self):
+        """Arranca el precalentamiento en un hilo propio y devuelve inmediatamente."""
+        if self._hilo is None:
+            self.inicio = time.perf_counter()
+            self._hilo = threading.Thread(target=self._ejecutar, name="precalentamiento", daemon=True)
+            self._hilo.start()
+        return self
+
+    def _tarea(self, nombre, funcion):
+        with self._lock:
+            self.en_curso.append(nombre)
+        t0 = time.perf_counter()
+        try:
+            funcion()
+        except Exception as e:
+            with self._lock:
+                self.errores.append((nombre, f"{type(e).__name__}: {e}"))
+        finally:
+            with self._lock:
+                self.en_curso.remove(nombre)
+                self.duraciones[nombre] = time.perf_counter() - t0
+                self.completadas += 1
+
+    def _ejecutar(self):
+        with ThreadPoolExecutor(max_workers=self._hilos, thread_name_prefix="precalentamiento") as ejecutor:
+            for etapa in self._etapas:
+                for futuro in [ejecutor.submit(self._tarea, nombre, funcion) for nombre, funcion in etapa]:
+                    futuro.result()
+        self.fin = time.perf_counter()
+
+    @property
+    def listo(self):
+        return self.fin is not None
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que termine (útil en scripts y pruebas). Devuelve `listo`."""
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        return self.listo
+
+    def estado(self):
+        """Instantánea del progreso: total, completadas, fracción, en curso, errores, listo y segundos transcurridos."""
+        with self._lock:
+            transcurrido = ((self.fin or time.perf_counter()) - self.inicio) if self.inicio else 0.0
+            return {
+                'total': self.total,
+                'completadas': self.completadas,
+                'fraccion': self.completadas / self.total if self.total else 1.0,
+                'en_curso': list(self.en_curso),
+                'errores': list(self.errores),
+                'listo': self.listo,
+                'segundos': transcurrido,
+            }
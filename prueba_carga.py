@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+# --- Prueba de carga con sesiones concurrentes de la app ---
+#
+# Cada usuario virtual es una sesión AppTest de streamlit_app.py (sin navegador
+# ni red) que ejecuta guiones de interacción: cambiar de modo, cambiar de rama,
+# enfocar una asignatura, escribir notas en la calculadora... Las sesiones
+# corren en hilos de un mismo proceso y comparten las cachés (st.cache_*), igual
+# que las sesiones de un servidor Streamlit, así que la memoria medida es la de
+# un proceso servidor con N alumnos a la vez.
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+TIMEOUT = 120
+
+MODO_GRAFICO = 'Gráfico Interactivo de Flujo'
+MODO_TABLA = 'Tabla de Ponderaciones'
+MODO_CALCULADORA = 'Calculadora de Nota de Acceso'
+
+BUSQUEDAS_ASIGNATURA = ['mate', 'fisica', 'biolo', 'quim', 'historia', 'dibujo', 'latin', 'geog']
+BUSQUEDAS_GRADO = ['ingenieria', 'medicina', 'derecho', 'educacion', 'biolog', 'admin', 'enfermeria', 'arquitec']
+
+
+def _rss_mb():
+    """Memoria residente actual del proceso (MB); en sistemas sin /proc, el pico."""
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+# --- Pasos de interacción: función(at, rng) que deja la sesión re-ejecutada ---
+
+def _modo(nombre):
+    return lambda at, rng: at.sidebar.radio(key='modo_viz').set_value(nombre).run()
+
+
+def _elegir(key, saltar_vacio=True):
+    def paso(at, rng):
+        selector = at.selectbox(key=key)
+        opciones = [o for o in selector.options if o and not (saltar_vacio and o in ('Ninguna', 'Selecciona un grado...'))]
+        if opciones:
+            selector.select(rng.choice(opciones))
+        at.run()
+    return paso
+
+
+def _buscar(key, textos):
+    return lambda at, rng: at.text_input(key=f"{key}_busqueda").input(rng.choice(textos)).run()
+
+
+def _alternar(key):
+    def paso(at, rng):
+        casilla = at.checkbox(key=key)
+        (casilla.uncheck() if casilla.value else casilla.check()).run()
+    return paso
+
+
+def _nota(key, minimo=0.0, maximo=10.0):
+    return lambda at, rng: at.number_input(key=key).set_value(round(rng.uniform(minimo, maximo), 2)).run()
+
+
+def _nota_especifica(at, rng):
+    entradas = [n for n in at.number_input if n.key and n.key.startswith('calc_nota_asig1_')]
+    if entradas:
+        entradas[0].set_value(round(rng.uniform(4.0, 10.0), 1))
+    at.run()
+
+
+def _pagina_siguiente(at, rng):
+    pagina = at.number_input(key='tabla_pagina')
+    pagina.set_value(pagina.value + 1).run()
+
+
+GUIONES = {
+    'grafico': [
+        ('modo_grafico', _modo(MODO_GRAFICO)),
+        ('cambiar_rama', _elegir('grafo_rama_filter')),
+        ('buscar_asignatura', _buscar('grafo_asignatura_enfocada', BUSQUEDAS_ASIGNATURA)),
+        ('enfocar_asignatura', _elegir('grafo_asignatura_enfocada')),
+        ('incluir_01', _alternar('grafo_show_01')),
+    ],
+    'calculadora': [
+        ('modo_calculadora', _modo(MODO_CALCULADORA)),
+        ('buscar_grado', _buscar('grado_seleccionado_calculadora_main_reactive', BUSQUEDAS_GRADO)),
+        ('elegir_grado', _elegir('grado_seleccionado_calculadora_main_reactive')),
+        ('nota_bachillerato', _nota('calc_nota_bach_reactive', 5.0)),
+        ('nota_fase_general', _nota('calc_nota_fase_gen_reactive', 4.0)),
+        ('elegir_especifica', _elegir('calc_asig1_sel_reactive')),
+        ('nota_especifica', _nota_especifica),
+    ],
+    'tabla': [
+        ('modo_tabla', _modo(MODO_TABLA)),
+        ('filtrar_rama_tabla', _elegir('tabla_rama_filter_grados', saltar_vacio=False)),
+        ('ordenar_tabla', _elegir('tabla_ordenar_por', saltar_vacio=False)),
+        ('pagina_siguiente', _pagina_siguiente),
+    ],
+}
+MEZCLA = {'grafico': 0.4, 'calculadora': 0.4, 'tabla': 0.2}
+
+
+# --- Ejecución ---
+
+# AppTest recompila el script en cada ejecución y en CPython < 3.12 compilar
+# desde varios hilos a la vez falla de forma esporádica ("AST constructor
+# recursion depth mismatch"): esa ejecución no llega a correr el script y deja
+# la sesión sin elementos. Un servidor real compila una sola vez, así que esos
+# fallos son del arnés: no se cuentan como errores de la app, se cuentan aparte
+# y la sesión se vuelve a abrir.
+_SCRIPT_NO_EJECUTADO = ('AST constructor recursion depth mismatch', 'SCRIPT_RUN_WITHOUT_ERRORS')
+
+
+class FalloArnes(Exception):
+    pass
+
+
+class Medidas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)  # interacción -> segundos
+        self.errores = defaultdict(int)
+        self.primer_error = {}  # interacción -> mensaje, para el informe
+        self.fallos_arnes = 0
+
+    def registrar(self, nombre, segundos, error=None):
+        with self._lock:
+            self.latencias[nombre].append(segundos)
+            if error:
+                self.errores[nombre] += 1
+                self.primer_error.setdefault(nombre, f"{type(error).__name__}: {error}"[:200])
+
+    def fallo_arnes(self):
+        with self._lock:
+            self.fallos_arnes += 1
+
+
+def _ejecutar(paso, at, rng):
+    """Ejecuta un paso y devuelve (segundos, error). Lanza FalloArnes si el script no llegó a ejecutarse."""
+    t0 = time.perf_counter()
+    try:
+        paso(at, rng)
+        error = at.exception or None
+    except Exception as e:
+        if any(marca in str(e) for marca in _SCRIPT_NO_EJECUTADO):
+            raise FalloArnes(str(e)) from e
+        error = e
+    segundos = time.perf_counter() - t0
+    if not error and not at.sidebar.radio:
+        if not at.error:
+            raise FalloArnes("La ejecución no produjo ningún elemento.")
+        # La app se ha detenido con un error propio (p. ej. no encontró el CSV)
+        error = RuntimeError('; '.join(e.value for e in at.error))
+    return segundos, error
+
+
+def _abrir(at, rng):
+    at.run()
+
+
+def _sesion(medidas, fin, semilla, mezcla):
+    rng = random.Random(semilla)
+    guiones, pesos = list(mezcla), list(mezcla.values())
+    at = None
+    while time.perf_counter() < fin:
+        try:
+            if at is None:
+                at = AppTest.from_file(APP, default_timeout=TIMEOUT)
+                segundos, error = _ejecutar(_abrir, at, rng)
+                medidas.registrar('carga_inicial', segundos, error)
+                if error:
+                    return  # si la app no arranca, repetir solo mediría el error
+            for nombre, paso in GUIONES[rng.choices(guiones, pesos)[0]]:
+                if time.perf_counter() >= fin:
+                    break
+                segundos, error = _ejecutar(paso, at, rng)
+                medidas.registrar(nombre, segundos, error)
+                if error:
+                    at = None  # el estado ya no es fiable: el alumno recarga la página
+                    break
+        except FalloArnes:
+            medidas.fallo_arnes()
+            at = None
+
+
+def medir(sesiones, duracion, semilla=0, mezcla=MEZCLA):
+    """Lanza `sesiones` usuarios simultáneos durante `duracion` segundos y devuelve el resumen."""
+    medidas = Medidas()
+    rss_inicial = _rss_mb()
+    inicio = time.perf_counter()
+    fin = inicio + duracion
+    hilos = [threading.Thread(target=_sesion, args=(medidas, fin, semilla * 1000 + i, mezcla), daemon=True)
+             for i in range(sesiones)]
+    rss_pico = rss_inicial
+    for hilo in hilos:
+        hilo.start()
+    while any(h.is_alive() for h in hilos):
+        rss_pico = max(rss_pico, _rss_mb())
+        time.sleep(0.2)
+    transcurrido = time.perf_counter() - inicio
+
+    interacciones = {}
+    for nombre, valores in sorted(medidas.latencias.items()):
+        ms = np.array(valores) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        interacciones[nombre] = {'n': len(ms), 'errores': medidas.errores[nombre],
+                                 'p50_ms': round(p50, 1), 'p95_ms': round(p95, 1), 'p99_ms': round(p99, 1)}
+    total = sum(v['n'] for k, v in interacciones.items() if k != 'carga_inicial')
+    return {
+        'sesiones': sesiones,
+        'segundos': round(transcurrido, 2),
+        'interacciones_por_segundo': round(total / transcurrido, 2),
+        'errores': sum(medidas.errores.values()),
+        'fallos_arnes': medidas.fallos_arnes,
+        'primer_error': dict(medidas.primer_error),
+        'rss_inicial_mb': round(rss_inicial, 1),
+        'rss_pico_mb': round(rss_pico, 1),
+        'interacciones': interacciones,
+    }
+
+
+def imprimir(resumen):
+    print(f"\n=== {resumen['sesiones']} sesiones · {resumen['segundos']} s · "
+          f"{resumen['interacciones_por_segundo']} interacciones/s · errores {resumen['errores']} · "
+          f"RSS {resumen['rss_inicial_mb']} -> {resumen['rss_pico_mb']} MB (pico)")
+    if resumen['fallos_arnes']:
+        print(f"ejecuciones descartadas por compilación concurrente (arnés): {resumen['fallos_arnes']}")
+    print(f"{'interacción':<22}{'n':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for nombre, m in resumen['interacciones'].items():
+        print(f"{nombre:<22}{m['n']:>8}{m['errores']:>6}{m['p50_ms']:>10}{m['p95_ms']:>10}{m['p99_ms']:>10}")
+    for nombre, mensaje in resumen['primer_error'].items():
+        print(f"  primer error en {nombre}: {mensaje}")
+
+
+# --- SCRIPT PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de streamlit_app.py con sesiones concurrentes sin navegador.")
+    parser.add_argument('--sesiones', default='1,2,4,8', help="Niveles de concurrencia separados por comas (por defecto 1,2,4,8).")
+    parser.add_argument('--duracion', type=float, default=20.0, help="Segundos por nivel.")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--mezcla', default=None, help="Pesos de los guiones, p. ej. 'grafico=1,calculadora=3,tabla=0'.")
+    parser.add_argument('--json', default=None, help="Guarda los resultados en este archivo.")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(APP))  # la app lee sus CSV con rutas relativas, como con `streamlit run`
+
+    mezcla = MEZCLA
+    if args.mezcla:
+        mezcla = {nombre: float(peso) for nombre, _, peso in (p.partition('=') for p in args.mezcla.split(','))}
+        desconocidos = set(mezcla) - set(GUIONES)
+        if desconocidos:
+            parser.error(f"Guiones desconocidos: {', '.join(sorted(desconocidos))}. Disponibles: {', '.join(GUIONES)}.")
+        mezcla = {k: v for k, v in mezcla.items() if v > 0}
+
+    resultados = []
+    for n in [int(x) for x in args.sesiones.split(',')]:
+        resumen = medir(n, args.duracion, args.semilla, mezcla)
+        imprimir(resumen)
+        resultados.append(resumen)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from compacto import agrupar_filas
+from datos import columnas_asignaturas
+
+# --- Índice de grados con perfil de ponderación similar ---
+
+METRICAS = ('coseno', 'jaccard')
+
+
+class IndiceSimilitud:
+    """
+    Vecinos más cercanos entre grados según su vector de ponderaciones.
+
+    Se construye una vez por versión del dataset. Los grados con el mismo vector
+    se agrupan en perfiles y la similitud entre perfiles se calcula por bloques
+    (producto de matrices), guardando solo los `k_max` vecinos de cada perfil:
+    la memoria no crece con n² y cada consulta es una lectura de esa tabla.
+    """
+
+    def __init__(self, df, k_max=25, tam_bloque=1024):
+        df_unico = df.drop_duplicates(subset='Grado').reset_index(drop=True)
+        self.grados = df_unico['Grado'].to_numpy()
+        self.ramas = df_unico['Rama_de_conocimiento'].to_numpy()
+        self.asignaturas = columnas_asignaturas(df_unico)
+        self._posicion = {grado: i for i, grado in enumerate(self.grados)}
+        self._columna = {asig: j for j, asig in enumerate(self.asignaturas)}
+
+        pesos = df_unico[self.asignaturas].to_numpy(dtype=np.float32)
+        primeras, self._perfil_de_grado = agrupar_filas(pesos)
+        self._pesos = pesos[primeras]
+        orden = np.argsort(self._perfil_de_grado, kind='stable')
+        cortes = np.cumsum(np.bincount(self._perfil_de_grado, minlength=len(self._pesos)))[:-1]
+        self._miembros = np.split(orden, cortes)
+
+        normas = np.linalg.norm(self._pesos, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        self._unitarios = self._pesos / normas
+        self._binarios = (self._pesos > 0).astype(np.float32)
+
+        self.k_max = min(k_max, max(len(self.grados) - 1, 0))
+        self._tam_bloque = tam_bloque
+        self._vecinos = {metrica: self._calcular_tabla_vecinos(metrica) for metrica in METRICAS}
+
+    def _similitud(self, metrica, filas, columnas=None):
+        """Matriz de similitud entre los perfiles `filas` y todos los perfiles."""
+        if metrica == 'coseno':
+            if columnas is None:
+                return self._unitarios[filas] @ self._unitarios.T
+            sub = self._pesos[:, columnas]
+            normas = np.linalg.norm(sub, axis=1)
+            normas[normas == 0] = 1.0
+            sub = sub / normas[:, None]
+            return sub[filas] @ sub.T
+        if metrica == 'jaccard':
+            binarios = self._binarios if columnas is None else self._binarios[:, columnas]
+            tamanos = binarios.sum(axis=1)
+            interseccion = binarios[filas] @ binarios.T
+            union = tamanos[filas][:, None] + tamanos[None, :] - interseccion
+            union[union == 0] = np.inf  # dos perfiles vacíos no se parecen en nada
+            return interseccion / union
+        raise ValueError(f"Métrica desconocida: {metrica!r}. Usa una de {METRICAS}.")
+
+    def _calcular_tabla_vecinos(self, metrica):
+        """Top-k de perfiles vecinos de cada perfil, calculado por bloques de filas."""
+        n = len(self._pesos)
+        k = max(min(self.k_max, n - 1), 0)
+        indices = np.zeros((n, k), dtype=np.int32)
+        valores = np.zeros((n, k), dtype=np.float32)
+        for inicio in range(0, n if k > 0 else 0, self._tam_bloque):
+            filas = np.arange(inicio, min(inicio + self._tam_bloque, n))
+            sim = self._similitud(metrica, filas)
+            sim[np.arange(len(filas)), filas] = -np.inf  # cada perfil ya aporta sus propios miembros
+            top = np.argpartition(sim, n - k, axis=1)[:, n - k:]
+            top_vals = np.take_along_axis(sim, top, axis=1)
+            orden = np.argsort(-top_vals, axis=1, kind='stable')
+            indices[filas] = np.take_along_axis(top, orden, axis=1)
+            valores[filas] = np.take_along_axis(top_vals, orden, axis=1)
+        return indices, valores
+
+    def _expandir(self, i, perfiles, similitudes, k):
+        """Reparte el ranking de perfiles entre sus grados hasta reunir `k` grados."""
+        idx, vals = [], []
+        for perfil, sim in zip(perfiles, similitudes):
+            if len(idx) >= k or sim <= 0:
+                break
+            miembros = self._miembros[perfil]
+            miembros = miembros[miembros != i][:k - len(idx)]
+            idx.extend(miembros)
+            vals.extend([sim] * len(miembros))
+        return np.asarray(idx, dtype=int), np.asarray(vals, dtype=float)
+
+    def vecinos(self, grado, k=10, metrica='coseno', asignaturas=None):
+        """
+        Grados más parecidos a `grado`.
+
+        Sin `asignaturas` se responde desde la tabla precalculada. Con una lista
+        de asignaturas se compara solo sobre esas columnas ("qué grados ponderan
+        mis asignaturas como este"), lo que cuesta un único producto vector-matriz.
+        """
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica!r}. Usa una de {METRICAS}.")
+        if grado not in self._posicion:
+            return pd.DataFrame(columns=['Grado', 'Rama_de_conocimiento', 'Similitud'])
+        i = self._posicion[grado]
+        propio = self._perfil_de_grado[i]
+
+        if asignaturas:
+            columnas = [self._columna[a] for a in asignaturas if a in self._columna]
+            sim = self._similitud(metrica, [propio], columnas)[0]
+            perfiles = np.argsort(-sim, kind='stable')
+            similitudes = sim[perfiles]
+        else:
+            indices, valores = self._vecinos[metrica]
+            sim_propia = 1.0 if self._binarios[propio].any() else 0.0  # mismo vector: similitud máxima
+            perfiles = np.concatenate([[propio], indices[propio]])
+            similitudes = np.concatenate([[sim_propia], valores[propio]])
+
+        idx, vals = self._expandir(i, perfiles, similitudes, k)
+        return pd.DataFrame({
+            'Grado': self.grados[idx],
+            'Rama_de_conocimiento': self.ramas[idx],
+            'Similitud': np.round(vals, 3),
+        })
@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+
+from datos import COLUMNAS_ID
+
+# --- Tabla de ponderaciones paginada en el servidor ---
+
+
+class TablaIndexada:
+    """
+    Tabla de ponderaciones preparada para servir páginas.
+
+    Se indexa una vez por versión del dataset: filas por rama, filas por grado
+    y un orden precalculado por columna. Cada consulta filtra con máscaras
+    booleanas, recorre el orden ya calculado y devuelve solo la página visible
+    con las columnas pedidas, así que el coste y el tamaño de la respuesta no
+    dependen del número total de filas. Trabaja sobre un DatasetCompacto: ordena
+    por códigos y solo decodifica las celdas de la página servida.
+    """
+
+    def __init__(self, dataset):
+        self._dataset = dataset
+        self.asignaturas = dataset.asignaturas
+        self._n = len(dataset)
+        self._ordenes = {}
+
+    @property
+    def columnas(self):
+        return COLUMNAS_ID + self.asignaturas
+
+    @staticmethod
+    def _rangos(categorico):
+        """Posición alfabética de cada fila según su categoría (orden equivalente al de los textos)."""
+        rango = np.empty(len(categorico.categories), dtype=np.int64)
+        rango[np.argsort(categorico.categories.to_numpy(dtype=object), kind='stable')] = np.arange(len(rango))
+        return rango[categorico.codes]
+
+    def _orden(self, columna, ascendente=True):
+        """
+        Permutación por `columna`, ascendente o descendente, calculada una sola vez.
+        Los empates van siempre por Grado de la A a la Z.
+        """
+        clave = (columna, ascendente)
+        if clave not in self._ordenes:
+            grados = self._rangos(self._dataset.grados)
+            signo = 1 if ascendente else -1
+            if columna == 'Grado':
+                self._ordenes[clave] = np.argsort(signo * grados, kind='stable')
+            elif columna == 'Rama_de_conocimiento':
+                self._ordenes[clave] = np.lexsort((grados, signo * self._rangos(self._dataset.ramas)))
+            else:
+                # TABLA_PONDERACIONES es creciente: ordenar por código es ordenar por ponderación
+                codigos = self._dataset.codigos[:, self._dataset.columna(columna)].astype(np.int64)
+                self._ordenes[clave] = np.lexsort((grados, signo * codigos))
+        return self._ordenes[clave]
+
+    def _mascara(self, rama=None, grados=None):
+        mascara = np.ones(self._n, dtype=bool)
+        if rama is not None:
+            mascara[:] = False
+            mascara[self._dataset.filas_de_rama(rama)] = True
+        if grados:
+            seleccion = np.zeros(self._n, dtype=bool)
+            for grado in grados:
+                seleccion[self._dataset.filas_de_grado(grado)] = True
+            mascara &= seleccion
+        return mascara
+
+    def consultar(self, rama=None, grados=None, columnas=None, ordenar_por='Grado', ascendente=True,
+                  pagina=1, tam_pagina=50, ocultar_columnas_vacias=False):
+        """
+        Devuelve (página, total_filas, total_páginas).
+
+        `columnas` limita las asignaturas mostradas (None = todas). Con
+        `ocultar_columnas_vacias` se podan además las asignaturas que no ponderan
+        para ninguna de las filas filtradas.
+        """
+        mascara = self._mascara(rama, grados)
+        orden = self._orden(ordenar_por if ordenar_por in self.columnas else 'Grado', ascendente)
+        filas = orden[mascara[orden]]
+
+        total_filas = len(filas)
+        total_paginas = max(1, math.ceil(total_filas / tam_pagina))
+        pagina = min(max(1, pagina), total_paginas)
+
+        asignaturas = [a for a in (columnas or self.asignaturas) if a in self.asignaturas]
+        if ocultar_columnas_vacias and total_filas:
+            posiciones = [self._dataset.columna(a) for a in asignaturas]
+            ponderan = (self._dataset.codigos[np.ix_(filas, posiciones)] > 0).any(axis=0)
+            asignaturas = [a for a, pondera in zip(asignaturas, ponderan) if pondera]
+
+        inicio = (pagina - 1) * tam_pagina
+        filas_pagina = filas[inicio:inicio + tam_pagina]
+        df_pagina = self._dataset.a_dataframe(filas_pagina, asignaturas)
+        df_pagina.index = filas_pagina
+        return df_pagina, total_filas, total_paginas
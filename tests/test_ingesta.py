@@ -0,0 +1,38 @@
+import csv
+import os
+
+import pytest
+
+from ingesta import leer_ponderaciones
+
+CSV_PONDERACIONES = os.path.join(os.path.dirname(__file__), '..', 'ponderaciones_andalucia.csv')
+
+
+def _escribir(ruta, registros):
+    """Escribe registros (listas de celdas) o líneas tal cual (texto) en un CSV."""
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f, lineterminator='\n')
+        for registro in registros:
+            if isinstance(registro, str):
+                f.write(registro + '\n')
+            else:
+                escritor.writerow(registro)
+
+
+@pytest.mark.parametrize('tam_bloque', [2, 5000])
+def test_numeros_de_fila_tras_lineas_saltadas(tmp_path, tam_bloque):
+    with open(CSV_PONDERACIONES, encoding='utf-8', newline='') as f:
+        cabecera, *filas = csv.reader(f)
+    antropologia = next(fila for fila in filas if fila[0].startswith('Antropología'))
+    peso_malo = antropologia[:2] + ['0,3'] + antropologia[3:]
+    mal_formada = ','.join(['x'] * (len(cabecera) + 3))
+    ruta = tmp_path / 'ponderaciones.csv'
+    # Registro 4 mal formado, 5 vacío y 6 con una ponderación no válida
+    _escribir(ruta, [cabecera, filas[0], filas[1], filas[2], mal_formada, '', peso_malo, filas[3]])
+
+    resultado = leer_ponderaciones(ruta, tam_bloque=tam_bloque)
+
+    assert [(i.fila, i.grado) for i in resultado.incidencias] == [(4, None), (6, antropologia[0])]
+    assert resultado.incidencias[0].motivo.startswith('Fila mal formada')
+    assert resultado.incidencias[1].motivo.startswith('Ponderación no válida')
+    assert len(resultado.df) == 4
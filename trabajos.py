@@ -0,0 +1,88 @@
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+# --- Trabajos cancelables en segundo plano ---
+#
+# Para generaciones costosas que dependen de lo que el usuario tiene elegido en
+# ese momento (p. ej. el gráfico de una rama con unos filtros): cada sesión
+# guarda su último trabajo y, al pedir otro, cancela el anterior. Un trabajo en
+# cola se descarta sin ejecutarse; uno en curso se detiene en el siguiente punto
+# de comprobación (la función recibe `comprobar_cancelacion`), de modo que los
+# hilos solo trabajan en lo que se va a mostrar.
+
+
+class TrabajoCancelado(Exception):
+    pass
+
+
+class Trabajo:
+    """Un cálculo enviado al pool, identificado por su clave (los parámetros que lo definen)."""
+
+    def __init__(self, clave, generacion):
+        self.clave = clave
+        self.generacion = generacion
+        self._cancelado = threading.Event()
+        self._futuro = None
+
+    def comprobar(self):
+        """Lanza TrabajoCancelado si el trabajo ya no interesa."""
+        if self._cancelado.is_set():
+            raise TrabajoCancelado(f"Trabajo {self.generacion} cancelado")
+
+    def cancelar(self):
+        self._cancelado.set()
+        if self._futuro is not None:
+            self._futuro.cancel()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    @property
+    def listo(self):
+        return self._futuro is not None and self._futuro.done()
+
+    @property
+    def fallido(self):
+        return self.listo and not self._futuro.cancelled() and self._futuro.exception() is not None
+
+    def resultado(self, timeout=None):
+        """Resultado del cálculo (espera hasta `timeout`); lanza TrabajoCancelado si se canceló."""
+        try:
+            return self._futuro.result(timeout)
+        except CancelledError:
+            raise TrabajoCancelado(f"Trabajo {self.generacion} cancelado") from None
+
+
+class PoolTrabajos:
+    """Pool de hilos compartido por todas las sesiones del proceso."""
+
+    def __init__(self, hilos=2):
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="trabajos")
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.cancelados = 0
+
+    def enviar(self, clave, funcion, *args, anterior=None, **kwargs):
+        """
+        Ejecuta `funcion(*args, comprobar_cancelacion=..., **kwargs)` en segundo
+        plano y devuelve su Trabajo. Si `anterior` (el último trabajo de la
+        sesión) tiene la misma clave y no se canceló ni falló, se reutiliza; si es otro,
+        se cancela.
+        """
+        if anterior is not None:
+            if anterior.clave == clave and not anterior.cancelado and not anterior.fallido:
+                return anterior
+            if not anterior.listo:
+                anterior.cancelar()
+                with self._lock:
+                    self.cancelados += 1
+        with self._lock:
+            self._generacion += 1
+            trabajo = Trabajo(clave, self._generacion)
+
+        def ejecutar():
+            trabajo.comprobar()
+            return funcion(*args, comprobar_cancelacion=trabajo.comprobar, **kwargs)
+        trabajo._futuro = self._ejecutor.submit(ejecutar)
+        return trabajo